@@ -0,0 +1,196 @@
+# Command line tool for building the word complexity index table from the relationship data, in bounded memory
+#
+# Usage:
+#   python build_word_complexity_index.py ../graph_data/relationships/cleaner_graph_df_no_terms.csv
+#   python build_word_complexity_index.py relationships.parquet -o ./data/word_complexity_index.csv --binary
+#   python build_word_complexity_index.py relationships.csv --vocabulary ../graph_data/nodes/word_nodes.csv
+#
+# The complexity value of a word is the inverse of the number of relationships with the word in the definition,
+# the same value as in_definition_value_index in the query_word_analysis_playground notebook
+
+import os
+import sys
+import time
+import argparse
+from typing import Iterator, Union
+
+import numpy as np
+from pandas import DataFrame, Series, read_csv
+
+from vocabulary import Vocabulary, UNKNOWN_WORD_ID
+from word_frequency_index import WORD_COMPLEXITY_INDEX_PATH, WORD_COMPLEXITY_INDEX_BINARY_PATH, write_binary_index, \
+    existing_binary_path
+
+# Number of relationship rows read at a time
+RELATIONSHIP_CHUNK_SIZE = 500_000
+# Column of the relationship data containing the word in the definition
+WORD_IN_DEFINITION_COLUMN = "word_in_definition"
+
+
+def iter_relationship_chunks(path: str, columns: list[str],
+                             chunksize: int = RELATIONSHIP_CHUNK_SIZE) -> Iterator[DataFrame]:
+    """Streams the given columns of the relationship data, chunksize rows at a time
+
+    Args:
+        path (str): The relationship data, a csv or parquet file
+        columns (list[str]): The columns to read
+        chunksize (int, optional): Number of rows read at a time. Defaults to RELATIONSHIP_CHUNK_SIZE.
+
+    Yields:
+        Iterator[DataFrame]: The columns of each chunk
+    """
+    if path.endswith(".parquet"):
+        # pyarrow is only needed for parquet input
+        from pyarrow.parquet import ParquetFile
+        for batch in ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    # keep_default_na is off so that real words like "nan" and "null" are counted
+    yield from read_csv(path, usecols=columns, chunksize=chunksize, keep_default_na=False)
+
+
+def iter_word_columns(path: str, column: str = WORD_IN_DEFINITION_COLUMN,
+                      chunksize: int = RELATIONSHIP_CHUNK_SIZE) -> Iterator[Series]:
+    """Streams a single column of the relationship data, chunksize rows at a time
+
+    Args:
+        path (str): The relationship data, a csv or parquet file
+        column (str, optional): The column to read. Defaults to WORD_IN_DEFINITION_COLUMN.
+        chunksize (int, optional): Number of rows read at a time. Defaults to RELATIONSHIP_CHUNK_SIZE.
+
+    Yields:
+        Iterator[Series]: The words of each chunk
+    """
+    for chunk in iter_relationship_chunks(path, [column], chunksize):
+        yield chunk[column]
+
+
+class WordCounter:
+    """
+    Counts words into a NumPy array keyed by word id. With a fixed vocabulary the array never grows and
+    words outside the vocabulary are skipped, otherwise ids are given to words as they are first seen
+    """
+
+    def __init__(self, vocabulary: Union[Vocabulary, None] = None):
+        self.vocabulary = vocabulary
+        self.counts = np.zeros(
+            len(vocabulary) if vocabulary is not None else 1024, dtype=np.int64)
+        # Only used without a fixed vocabulary, one entry per distinct word rather than per row
+        self._word_ids: dict[str, int] = {}
+        self.skipped = 0
+
+    def add(self, words: Series) -> None:
+        """Counts a chunk of words, each distinct word of the chunk is only looked up once
+
+        Args:
+            words (Series): The words to count
+        """
+        chunk_counts = words[words.astype(bool)].astype(str).value_counts(sort=False)
+        if self.vocabulary is not None:
+            word_ids = self.vocabulary.lookup_ids(chunk_counts.index)
+            known = word_ids != UNKNOWN_WORD_ID
+            self.skipped += int(chunk_counts.to_numpy()[~known].sum())
+            np.add.at(self.counts, word_ids[known],
+                      chunk_counts.to_numpy()[known])
+            return
+        word_ids = np.fromiter((self._word_ids.setdefault(word, len(self._word_ids))
+                                for word in chunk_counts.index), dtype=np.int64, count=len(chunk_counts))
+        if len(self._word_ids) > len(self.counts):
+            # Doubling, so the array is only copied a few times
+            grown = np.zeros(max(len(self._word_ids), 2 *
+                             len(self.counts)), dtype=np.int64)
+            grown[:len(self.counts)] = self.counts
+            self.counts = grown
+        self.counts[word_ids] += chunk_counts.to_numpy()
+
+    def to_dataframe(self) -> DataFrame:
+        """Gets the complexity value of every counted word, most frequent words first
+
+        Returns:
+            DataFrame: The word and frequency (the inverse of the word's count) columns of the word complexity index
+        """
+        if self.vocabulary is not None:
+            word_ids = np.flatnonzero(self.counts)
+            words = [self.vocabulary.word(word_id) for word_id in word_ids]
+        else:
+            words = list(self._word_ids)
+            word_ids = np.arange(len(words))
+        counts = self.counts[word_ids]
+        # Stable sort, so words with the same count keep their order
+        order = np.argsort(-counts, kind="stable")
+        return DataFrame({"word": np.asarray(words, dtype=object)[order] if len(words) else [],
+                          "frequency": 1 / counts[order]})
+
+
+def build_word_complexity_index(source: str, output_path: str = WORD_COMPLEXITY_INDEX_PATH,
+                                vocabulary: Union[Vocabulary, None] = None, column: str = WORD_IN_DEFINITION_COLUMN,
+                                chunksize: int = RELATIONSHIP_CHUNK_SIZE, binary_path: Union[str, None] = None,
+                                update_binary: bool = True) -> int:
+    """Builds the word complexity index csv from the relationship data, streaming it in chunks so memory
+    depends on the number of distinct words and not on the number of relationships
+
+    Args:
+        source (str): The relationship data, a csv or parquet file
+        output_path (str, optional): The csv file to write. Defaults to WORD_COMPLEXITY_INDEX_PATH.
+        vocabulary (Union[Vocabulary, None], optional): If given, only the words of the vocabulary are counted. Defaults to None.
+        column (str, optional): The column containing the word in the definition. Defaults to WORD_IN_DEFINITION_COLUMN.
+        chunksize (int, optional): Number of rows read at a time. Defaults to RELATIONSHIP_CHUNK_SIZE.
+        binary_path (Union[str, None], optional): If given, the binary table is written as well. Defaults to None.
+        update_binary (bool, optional): If true and no binary_path is given, the binary table next to the csv is
+            rewritten if it has been built, since it is read instead of the csv. Defaults to True.
+
+    Returns:
+        int: The number of words in the index
+    """
+    counter = WordCounter(vocabulary)
+    for words in iter_word_columns(source, column, chunksize):
+        counter.add(words)
+    if counter.skipped:
+        print(f"Skipped {counter.skipped} relationships with words outside of the vocabulary",
+              file=sys.stderr)
+    word_complexity_index = counter.to_dataframe()
+    # Writing to a temporary file first, so the app never reads a partially written table
+    temp_path = f"{output_path}.tmp"
+    word_complexity_index.to_csv(temp_path, index=False)
+    os.replace(temp_path, output_path)
+    if not binary_path and update_binary:
+        binary_path = existing_binary_path(output_path)
+    if binary_path:
+        write_binary_index(output_path, binary_path)
+    return len(word_complexity_index)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the word complexity index from the relationship data")
+    parser.add_argument(
+        "source", help="The relationship data, a csv or parquet file with a word in definition column")
+    parser.add_argument("-o", "--output", default=WORD_COMPLEXITY_INDEX_PATH,
+                        help="The word complexity index csv to write")
+    parser.add_argument("--binary", nargs="?", const=WORD_COMPLEXITY_INDEX_BINARY_PATH, default=None,
+                        help="Also write the binary, memory-mapped table (optionally to the given path)")
+    parser.add_argument("--no-binary", action="store_true",
+                        help="Do not rewrite the binary table next to the csv, which is rewritten by default if it exists")
+    parser.add_argument("--vocabulary", default=None,
+                        help="A csv with a word column (e.g. word_nodes.csv), only its words are counted")
+    parser.add_argument("--column", default=WORD_IN_DEFINITION_COLUMN,
+                        help="The column containing the word in the definition")
+    parser.add_argument("--chunksize", type=int, default=RELATIONSHIP_CHUNK_SIZE,
+                        help="Number of rows read at a time")
+    args = parser.parse_args()
+
+    vocabulary = None
+    if args.vocabulary:
+        vocabulary_words = read_csv(args.vocabulary, usecols=[
+                                    "word"], keep_default_na=False).word.astype(str)
+        vocabulary, _ = Vocabulary.from_words(
+            vocabulary_words[vocabulary_words.astype(bool)].unique().tolist())
+    start = time.time()
+    word_count = build_word_complexity_index(args.source, args.output, vocabulary, args.column,
+                                             args.chunksize, args.binary, not args.no_binary)
+    print(f"Wrote {word_count} words to {args.output} in {time.time() - start:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
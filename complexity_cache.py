@@ -0,0 +1,105 @@
+# Bounded cache of complexity index results, for texts that are submitted again and again
+
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from utils import complexity_index
+from word_frequency_index import WordFrequencyIndex
+
+# Max number of results kept in the cache
+RESULT_CACHE_SIZE = 10_000
+# Max (approximate) number of bytes used by the cached results
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class ComplexityResultCache:
+    """
+    A memory-bounded LRU cache of complexity index results, keyed by a hash of the text, whether wikipedia summaries
+    were used, the version of the frequency table and its metric. The cache is cleared when the frequency table is reloaded.
+    Results that used wikipedia summaries are not cached, since a summary that failed to load would keep the
+    degraded score in the cache (the summaries themselves are cached by utils.wikipedia_summary_cache)
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._results: OrderedDict[tuple[bytes, bool, int, str],
+                                   tuple[str, tuple[str, ...], int]] = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def complexity_index(self, frequency_index: WordFrequencyIndex, text: str, use_wikipedia_summaries: bool,
+                         scorer: Callable[[WordFrequencyIndex, str, bool], tuple[str, list[str]]] = complexity_index) -> tuple[str, list[str]]:
+        """Gets the complexity index of the text from the cache, calculating it with the scorer on a miss
+
+        Args:
+            frequency_index (WordFrequencyIndex): The index of words to the values used in calculating the index
+            text (str): The text to be calculated
+            use_wikipedia_summaries (bool): If true, unknown words are replaced by the words in their wikipedia summaries
+            scorer (Callable, optional): The function calculating the index on a miss. Defaults to utils.complexity_index.
+
+        Returns:
+            tuple[str, list[str]]: The complexity index of the text and its unknown words
+        """
+        use_wikipedia_summaries = bool(use_wikipedia_summaries)
+        key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(),
+               use_wikipedia_summaries, frequency_index.version, frequency_index.metric)
+        with self._lock:
+            # A reloaded table invalidates every result
+            if frequency_index.version != self._version:
+                self._clear()
+                self._version = frequency_index.version
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result[0], list(result[1])
+            self.misses += 1
+        average_index, unknown_words = scorer(
+            frequency_index, text, use_wikipedia_summaries)
+        # Without unknown words no summaries were needed, so the result does not depend on Wikipedia
+        if use_wikipedia_summaries and unknown_words:
+            return average_index, list(unknown_words)
+        size = sys.getsizeof(average_index) + \
+            sum(sys.getsizeof(word) for word in unknown_words) + 200
+        with self._lock:
+            if key[2] == self._version and key not in self._results:
+                self._results[key] = (
+                    average_index, tuple(unknown_words), size)
+                self._bytes += size
+                # Removing the least recently used results until the cache is back within its limits
+                while self._results and (len(self._results) > self.max_entries or self._bytes > self.max_bytes):
+                    _, (_, _, removed_size) = self._results.popitem(last=False)
+                    self._bytes -= removed_size
+        return average_index, list(unknown_words)
+
+    def _clear(self):
+        self._results.clear()
+        self._bytes = 0
+
+    def clear(self):
+        '''Remove all of the cached results'''
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        """Gets the hit and miss statistics of the cache
+
+        Returns:
+            dict: The number of hits, misses, the hit rate, and the number of entries and bytes in the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups != 0 else 0.0,
+                "entries": len(self._results),
+                "bytes": self._bytes
+            }
@@ -140,12 +140,24 @@ unknown_word_list = html.P(
 use_wikipedia_summaries_checkbox = dcc.Checklist(
     ['Replace Unknown Words/Terms with Wikipedia Summaries (if available)'], id='use-wikipedia-summaries', style={"float": "right", "margin-right": "10%", "margin-top": "5px"})
 
+# Complexity Metric Options, the graph metrics are only available once graph_metrics.py has been run
+complexity_metric_options = [
+    {'label': 'Definition Frequency', 'value': 'frequency'},
+    {'label': 'PageRank', 'value': 'pagerank'},
+    {'label': 'Weighted In-Degree', 'value': 'in_degree'},
+    {'label': 'Definitional Depth', 'value': 'depth'}
+]
+complexity_metric_dropdown = dcc.Dropdown(
+    complexity_metric_options, 'frequency', id='complexity-metric', clearable=False,
+    style={'width': '250px', 'margin-left': '10%', 'margin-top': '10px'})
+
 complexity_calculations = html.Div([
     text_area_input,
     html.Div(children=[dbc.Button('Submit', color="primary", id='submit-text-complexity',
                                   n_clicks=0, style={'margin-left': '10%'}),
                        use_wikipedia_summaries_checkbox]
              ),
+    complexity_metric_dropdown,
     complexity_index_output,
     unknown_word_list
 ])
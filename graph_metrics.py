@@ -0,0 +1,294 @@
+# Offline job computing graph metrics of every word from the HAS_WORD relationships, written as extra
+# metric columns of the word complexity index table so scoring stays a single lookup per word
+#
+# Usage:
+#   python graph_metrics.py ../graph_data/relationships/cleaner_graph_df_no_terms.csv
+#   python graph_metrics.py relationships.parquet --index ./data/word_complexity_index.csv --binary
+#   python graph_metrics.py relationships.csv --basic-vocabulary basic_words.txt
+#
+# Metrics (higher for more complex words):
+#   pagerank:  PageRank of the word, with rank flowing from each word to the words in its definition,
+#              converted to a complexity value between 0 and 1
+#   in_degree: the number of times the word appears in definitions, weighted by the count column,
+#              converted to a complexity value between 0 and 1
+#   depth:     the definitional depth, the fewest HAS_WORD hops from the word to a word of the basic vocabulary
+
+import os
+import sys
+import time
+import argparse
+from typing import Union
+
+import numpy as np
+from pandas import factorize, read_csv
+
+from build_word_complexity_index import iter_relationship_chunks, RELATIONSHIP_CHUNK_SIZE, WORD_IN_DEFINITION_COLUMN
+from word_frequency_index import WORD_COMPLEXITY_INDEX_PATH, WORD_COMPLEXITY_INDEX_BINARY_PATH, write_binary_index, \
+    existing_binary_path
+
+# Column of the relationship data containing the defined word, the start of each HAS_WORD relationship
+WORD_COLUMN = "word"
+# Column of the relationship data containing the number of times the word appears in the definition
+COUNT_COLUMN = "count"
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_MAX_ITERATIONS = 100
+# Without a basic vocabulary file, the most frequent words in definitions are the basic vocabulary
+BASIC_VOCABULARY_SIZE = 1000
+
+
+class WordGraph:
+    """
+    The HAS_WORD graph as a sparse edge list (coordinate format), with every word given a dense integer id.
+    Multiplying by the sparse matrix is a np.bincount over the edges, so no sparse matrix library is needed
+    """
+
+    def __init__(self, words: list[str], sources: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+        self.words = words
+        self.sources = sources
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_relationships(cls, path: str, weighted: bool = True,
+                           chunksize: int = RELATIONSHIP_CHUNK_SIZE) -> "WordGraph":
+        """Reads the graph from the relationship data in chunks, keeping only the integer edge list in memory
+
+        Args:
+            path (str): The relationship data, a csv or parquet file
+            weighted (bool, optional): If true, the count column is the weight of each edge. Defaults to True.
+            chunksize (int, optional): Number of rows read at a time. Defaults to RELATIONSHIP_CHUNK_SIZE.
+
+        Returns:
+            WordGraph: The graph of each word to the words in its definition
+        """
+        columns = [WORD_COLUMN, WORD_IN_DEFINITION_COLUMN] + \
+            ([COUNT_COLUMN] if weighted else [])
+        word_ids: dict[str, int] = {}
+        sources, targets, weights = [], [], []
+        for chunk in iter_relationship_chunks(path, columns, chunksize):
+            chunk = chunk[chunk[WORD_COLUMN].astype(bool) &
+                          chunk[WORD_IN_DEFINITION_COLUMN].astype(bool)]
+            # Only the distinct words of each chunk are given ids one at a time
+            codes, unique_words = factorize(
+                np.concatenate([chunk[WORD_COLUMN].astype(str).to_numpy(),
+                                chunk[WORD_IN_DEFINITION_COLUMN].astype(str).to_numpy()]))
+            unique_ids = np.fromiter((word_ids.setdefault(word, len(word_ids)) for word in unique_words),
+                                     dtype=np.int32, count=len(unique_words))
+            chunk_ids = unique_ids[codes]
+            sources.append(chunk_ids[:len(chunk)])
+            targets.append(chunk_ids[len(chunk):])
+            weights.append(chunk[COUNT_COLUMN].to_numpy(dtype=np.float64) if weighted
+                           else np.ones(len(chunk), dtype=np.float64))
+        return cls(list(word_ids),
+                   np.concatenate(sources) if sources else np.empty(
+                       0, dtype=np.int32),
+                   np.concatenate(targets) if targets else np.empty(
+                       0, dtype=np.int32),
+                   np.concatenate(weights) if weights else np.empty(0, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def in_degree(self) -> np.ndarray:
+        """Gets the weighted in-degree of every word, the number of times it appears in definitions
+
+        Returns:
+            np.ndarray: The weighted in-degree of each word, by word id
+        """
+        return np.bincount(self.targets, weights=self.weights, minlength=len(self))
+
+    def pagerank(self, damping: float = PAGERANK_DAMPING, tolerance: float = PAGERANK_TOLERANCE,
+                 max_iterations: int = PAGERANK_MAX_ITERATIONS) -> np.ndarray:
+        """Computes the weighted PageRank of every word by power iteration over the sparse edge list.
+        The rank of words without a definition (dangling words) is spread evenly over every word
+
+        Args:
+            damping (float, optional): The damping factor. Defaults to PAGERANK_DAMPING.
+            tolerance (float, optional): Stops once the L1 change of the ranks is below this. Defaults to PAGERANK_TOLERANCE.
+            max_iterations (int, optional): Max number of iterations. Defaults to PAGERANK_MAX_ITERATIONS.
+
+        Returns:
+            np.ndarray: The PageRank of each word (summing to 1), by word id
+        """
+        word_count = len(self)
+        if word_count == 0:
+            return np.empty(0, dtype=np.float64)
+        out_weights = np.bincount(
+            self.sources, weights=self.weights, minlength=word_count)
+        # The share of each word's rank passed along each of its edges
+        edge_shares = self.weights / out_weights[self.sources]
+        dangling = out_weights == 0
+        ranks = np.full(word_count, 1 / word_count)
+        for _ in range(max_iterations):
+            passed = np.bincount(
+                self.targets, weights=edge_shares * ranks[self.sources], minlength=word_count)
+            new_ranks = (1 - damping) / word_count + damping * \
+                (passed + ranks[dangling].sum() / word_count)
+            change = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if change < tolerance:
+                break
+        return ranks
+
+    def definitional_depth(self, basic_word_ids: np.ndarray) -> np.ndarray:
+        """Computes the definitional depth of every word with a single multi-source breadth first search from the
+        basic vocabulary over the reversed HAS_WORD relationships, visiting each word and relationship once.
+        Each level of the search expands the whole frontier at once with NumPy
+
+        Args:
+            basic_word_ids (np.ndarray): The ids of the words of the basic vocabulary, which have a depth of 0
+
+        Returns:
+            np.ndarray: The fewest hops from each word to a basic word through the words in its definitions,
+            -1 for words that can not reach the basic vocabulary
+        """
+        word_count = len(self)
+        # Reversed graph in compressed sparse row format, from each definition word to the words it defines
+        indptr = np.zeros(word_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=word_count),
+                  out=indptr[1:])
+        defined_words = self.sources[np.argsort(self.targets, kind="stable")]
+
+        depths = np.full(word_count, -1, dtype=np.int64)
+        frontier = np.unique(np.asarray(basic_word_ids, dtype=np.int64))
+        depths[frontier] = 0
+        depth = 0
+        while len(frontier):
+            depth += 1
+            starts = indptr[frontier]
+            lengths = indptr[frontier + 1] - starts
+            # The positions of every row of the frontier, concatenated
+            row_offsets = np.repeat(
+                starts - np.cumsum(lengths) + lengths, lengths)
+            neighbours = defined_words[row_offsets +
+                                       np.arange(lengths.sum())]
+            frontier = np.unique(neighbours[depths[neighbours] == -1])
+            depths[frontier] = depth
+        return depths
+
+
+def complexity_values(scores: np.ndarray) -> np.ndarray:
+    """Converts centrality scores (higher for simpler, more central words) into complexity values
+    between 0 and 1, the same way the frequency metric inverts the number of appearances
+
+    Args:
+        scores (np.ndarray): The positive centrality scores
+
+    Returns:
+        np.ndarray: The complexity values, 1 for the least central word, NaN for scores that are not positive
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(scores > 0, scores[scores > 0].min(initial=np.inf) / scores, np.nan)
+
+
+def read_basic_vocabulary(path: str) -> list[str]:
+    """Reads a basic vocabulary file, one word per line
+
+    Args:
+        path (str): The path to the file
+
+    Returns:
+        list[str]: The lowercased words of the basic vocabulary
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip().lower() for line in f if line.strip()]
+
+
+def add_graph_metrics(relationships_path: str, index_path: str = WORD_COMPLEXITY_INDEX_PATH,
+                      weighted: bool = True, chunksize: int = RELATIONSHIP_CHUNK_SIZE,
+                      binary_path: Union[str, None] = None, basic_vocabulary: Union[list[str], None] = None,
+                      basic_vocabulary_size: int = BASIC_VOCABULARY_SIZE, update_binary: bool = True) -> list[str]:
+    """Computes the graph metrics of every word and writes them as extra columns of the word complexity index table.
+    Words of the table missing from the graph get a pagerank and in_degree value of 1 (the most complex),
+    and words that can not reach the basic vocabulary get a depth of one more than the deepest word
+
+    Args:
+        relationships_path (str): The relationship data, a csv or parquet file
+        index_path (str, optional): The word complexity index csv to add the columns to. Defaults to WORD_COMPLEXITY_INDEX_PATH.
+        weighted (bool, optional): If true, the count column is the weight of each edge. Defaults to True.
+        chunksize (int, optional): Number of rows read at a time. Defaults to RELATIONSHIP_CHUNK_SIZE.
+        binary_path (Union[str, None], optional): If given, the binary table is written as well. Defaults to None.
+        basic_vocabulary (Union[list[str], None], optional): The words with a depth of 0, if None the
+            basic_vocabulary_size most frequent words of the table. Defaults to None.
+        basic_vocabulary_size (int, optional): The size of the default basic vocabulary. Defaults to BASIC_VOCABULARY_SIZE.
+        update_binary (bool, optional): If true and no binary_path is given, the binary table next to the csv is
+            rewritten if it has been built, since it is read instead of the csv. Defaults to True.
+
+    Returns:
+        list[str]: The names of the metric columns written
+    """
+    graph = WordGraph.from_relationships(
+        relationships_path, weighted, chunksize)
+    word_complexity_index = read_csv(index_path, keep_default_na=False)
+    if basic_vocabulary is None:
+        # The lowest frequency values are the words that appear in the most definitions
+        basic_vocabulary = word_complexity_index.nsmallest(
+            basic_vocabulary_size, "frequency", keep="first").word.astype(str).tolist()
+    graph_ids = {word: word_id for word_id, word in enumerate(graph.words)}
+    basic_word_ids = np.array([graph_ids[word] for word in basic_vocabulary if word in graph_ids],
+                              dtype=np.int64)
+    depths = graph.definitional_depth(basic_word_ids).astype(np.float64)
+    metrics = {
+        "pagerank": complexity_values(graph.pagerank()),
+        "in_degree": complexity_values(graph.in_degree()),
+        "depth": depths
+    }
+    positions = np.fromiter((graph_ids.get(word, -1) for word in word_complexity_index.word.astype(str)),
+                            dtype=np.int64, count=len(word_complexity_index))
+    found = positions != -1
+    for name, values in metrics.items():
+        column = np.ones(len(word_complexity_index), dtype=np.float64)
+        column[found] = values[positions[found]]
+        word_complexity_index[name] = np.nan_to_num(column, nan=1.0)
+    # Basic words missing from the graph still have a depth of 0, unreachable words are placed just past the deepest word
+    depth = word_complexity_index.depth.to_numpy(copy=True)
+    unreachable = ~found | (depth == -1)
+    depth[unreachable] = max(depths.max(initial=0), 0) + 1
+    depth[word_complexity_index.word.astype(str).isin(
+        set(basic_vocabulary)).to_numpy()] = 0
+    word_complexity_index["depth"] = depth
+    # Writing to a temporary file first, so the app never reads a partially written table
+    temp_path = f"{index_path}.tmp"
+    word_complexity_index.to_csv(temp_path, index=False)
+    os.replace(temp_path, index_path)
+    if not binary_path and update_binary:
+        binary_path = existing_binary_path(index_path)
+    if binary_path:
+        write_binary_index(index_path, binary_path)
+    return list(metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add graph metrics of every word to the word complexity index")
+    parser.add_argument(
+        "source", help="The relationship data, a csv or parquet file with word, word in definition and count columns")
+    parser.add_argument("--index", default=WORD_COMPLEXITY_INDEX_PATH,
+                        help="The word complexity index csv to add the metric columns to")
+    parser.add_argument("--binary", nargs="?", const=WORD_COMPLEXITY_INDEX_BINARY_PATH, default=None,
+                        help="Also write the binary, memory-mapped table (optionally to the given path)")
+    parser.add_argument("--no-binary", action="store_true",
+                        help="Do not rewrite the binary table next to the csv, which is rewritten by default if it exists")
+    parser.add_argument("--unweighted", action="store_true",
+                        help="Ignore the count column, every relationship has a weight of 1")
+    parser.add_argument("--chunksize", type=int, default=RELATIONSHIP_CHUNK_SIZE,
+                        help="Number of rows read at a time")
+    parser.add_argument("--basic-vocabulary", default=None,
+                        help="A file of basic words (one per line) with a definitional depth of 0")
+    parser.add_argument("--basic-vocabulary-size", type=int, default=BASIC_VOCABULARY_SIZE,
+                        help="Without a basic vocabulary file, the number of most frequent words used as the basic vocabulary")
+    args = parser.parse_args()
+
+    basic_vocabulary = read_basic_vocabulary(
+        args.basic_vocabulary) if args.basic_vocabulary else None
+    start = time.time()
+    metrics = add_graph_metrics(args.source, args.index, not args.unweighted,
+                                args.chunksize, args.binary, basic_vocabulary, args.basic_vocabulary_size,
+                                not args.no_binary)
+    print(f"Wrote {', '.join(metrics)} to {args.index} in {time.time() - start:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
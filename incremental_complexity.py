@@ -0,0 +1,85 @@
+# Incremental re-scoring of edited texts, only the sentences that changed since the last submit are scored again
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils import prep_complexity_index_text, sum_word_complexities, get_unknown_words_complexities, SENTENCE_END
+from word_frequency_index import WordFrequencyIndex
+
+# Max number of sentence scores kept in memory, the least recently used are removed first
+SEGMENT_CACHE_SIZE = 100_000
+
+
+class IncrementalComplexityScorer:
+    """
+    Calculates the complexity index of a text from the partial sums of each of its sentences. The partial sums
+    are kept in a bounded LRU cache keyed by the metric and a hash of the sentence, so when an edited text is submitted again
+    only the sentences that changed are scored
+    """
+
+    def __init__(self, max_segments: int = SEGMENT_CACHE_SIZE):
+        self.max_segments = max_segments
+        self._segments: OrderedDict[tuple[str, bytes],
+                                    tuple[float, int, list[str]]] = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _score_segment(self, frequency_index: WordFrequencyIndex, segment: str) -> tuple[float, int, list[str]]:
+        key = (frequency_index.metric, hashlib.blake2b(
+            segment.encode("utf-8"), digest_size=16).digest())
+        with self._lock:
+            # The scores are only valid for the table they were calculated with, so a reloaded table starts over
+            if frequency_index.version != self._version:
+                self._segments.clear()
+                self._version = frequency_index.version
+            score = self._segments.get(key)
+            if score is not None:
+                self._segments.move_to_end(key)
+                return score
+        score = sum_word_complexities(
+            frequency_index, prep_complexity_index_text(segment))
+        with self._lock:
+            if frequency_index.version == self._version:
+                self._segments[key] = score
+                if len(self._segments) > self.max_segments:
+                    self._segments.popitem(last=False)
+        return score
+
+    def complexity_index(self, frequency_index: WordFrequencyIndex, text: str,
+                         use_wikipedia_summaries: bool) -> tuple[str, list[str]]:
+        """Calculates an index for the complexity of the given text, giving the same result as utils.complexity_index
+
+        Args:
+            frequency_index (WordFrequencyIndex): The index of words to the values used in calculating the index
+            text (str): The text to be calculated
+            use_wikipedia_summaries (bool): If true, unknown words are replaced by the words in their wikipedia summaries
+
+        Returns:
+            str: The average of the index values for each word,
+            or a message warning the user that there are no words and therefore a division by zero was attempted
+        """
+        index = 0
+        count = 0
+        unknown_words = []
+        # Sentences are split at whitespace, so no word is split between two sentences
+        for segment in SENTENCE_END.split(text):
+            segment_index, segment_count, segment_unknown_words = self._score_segment(
+                frequency_index, segment)
+            index += segment_index
+            count += segment_count
+            unknown_words.extend(segment_unknown_words)
+        if use_wikipedia_summaries:
+            unknowns_index, unknowns_count = get_unknown_words_complexities(
+                frequency_index, unknown_words)
+            index += unknowns_index
+            count += unknowns_count
+        # Returning the average value of all the words
+        average_index = str(
+            index / count) if count != 0 else "Error, Attempted Division by Zero"
+        return average_index, unknown_words
+
+    def clear(self):
+        '''Remove all of the cached sentence scores'''
+        with self._lock:
+            self._segments.clear()
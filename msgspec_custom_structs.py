@@ -2,22 +2,41 @@
 
 from msgspec import Struct
 
+# Paths returned with resultDataContents ["row"], each record is {"row": [[node, relationship, node, ...]], "meta": [...]}.
+# Nodes are {"value": word} and the HAS_WORD relationships have no properties, so they decode with an empty value
 
-class Value(Struct):
-    word: str
 
+class PathElement(Struct, gc=False):
+    value: str = ""
 
-class RowItem(Struct):
-    value: str
 
+# The row is positional (one column, the path), so it is decoded as an array straight into the list of path elements
+class PathRow(Struct, array_like=True):
+    path: list[PathElement]
 
-class Row(Struct):
-    row: list[list[dict]]
 
+class PathRecord(Struct):
+    row: PathRow
 
-class Data(Struct):
-    data: list[Row]
 
+class PathData(Struct):
+    data: list[PathRecord]
 
-class Result(Struct):
-    results: list[Data]
+
+class PathResult(Struct):
+    results: list[PathData]
+
+
+# Server-side aggregated edges, each row is the source word, target word and number of paths containing the edge
+
+
+class EdgeRow(Struct):
+    row: tuple[str, str, int]
+
+
+class EdgeData(Struct):
+    data: list[EdgeRow]
+
+
+class EdgeResult(Struct):
+    results: list[EdgeData]
@@ -1,9 +1,14 @@
 import time
+import json
 import base64
+from threading import Lock
+from typing import Iterable, Iterator, Union
 from itertools import pairwise, chain
 from collections import Counter
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from neo4j import GraphDatabase
 from neo4j import Record
 import neo4j
@@ -11,10 +16,80 @@ from msgspec.json import decode
 
 from settings import URI, AUTH
 from msgspec_custom_structs import *
+from neo4j_stream import iter_records
 
 from nltk.corpus import stopwords
 eng_stopwords = set(stopwords.words('english'))
 
+# Localhost for Self-Managed Neo4j Instance
+NEO4J_HTTP_ENDPOINT = "http://localhost:7474/db/data/transaction/commit"
+# Max number of keep-alive connections to Neo4j, the max number of queries sent at the same time without waiting
+NEO4J_POOL_SIZE = 10
+# Seconds to wait for a connection, and for the response of a query
+NEO4J_TIMEOUT = (3.05, 60)
+# Retries of failed connections and of responses with a retryable status, with an exponential backoff between them.
+# Every query is read-only, so POST requests are safe to retry. Read errors and timeouts are never retried, since the
+# query already ran on Neo4j and a slow query would only run again
+NEO4J_MAX_RETRIES = 3
+NEO4J_RETRY_BACKOFF = 0.3
+NEO4J_RETRY_STATUSES = (502, 503, 504)
+# Bytes read from the socket at a time when streaming a response, the records of each chunk are decoded together
+NEO4J_STREAM_CHUNK_SIZE = 1 << 20
+
+# Queries sent with the word as a $word parameter, so Neo4j plans each query once and reuses the plan for every word.
+# Variable length path bounds can not be parameters in Cypher, so the depth is formatted in as a validated int,
+# giving one cached plan per depth
+WORD_PATHS_QUERY = "MATCH (w:Word) USING TEXT INDEX w:Word(value) WHERE w.value = $word MATCH p = (w)-[:HAS_WORD*1..{depth}]->(:Word){where_no_stopwords} RETURN p;"
+TWO_WORD_PATHS_QUERY = "MATCH p=(start:Word)-[:HAS_WORD*1..{depth}]->(end:Word) WHERE start.value = $first_word AND end.value = $second_word{and_no_stopwords} RETURN p ORDER BY length(p) ASC"
+# The same queries, but the relationships of every path are unwound and counted by Neo4j, returning only the distinct
+# source, target and count rows instead of every path with all of its nodes
+WORD_EDGES_QUERY = "MATCH (w:Word) USING TEXT INDEX w:Word(value) WHERE w.value = $word MATCH p = (w)-[:HAS_WORD*1..{depth}]->(:Word){where_no_stopwords} UNWIND relationships(p) AS r RETURN startNode(r).value AS source, endNode(r).value AS target, count(*) AS count;"
+TWO_WORD_EDGES_QUERY = "MATCH p=(start:Word)-[:HAS_WORD*1..{depth}]->(end:Word) WHERE start.value = $first_word AND end.value = $second_word{and_no_stopwords} UNWIND relationships(p) AS r RETURN startNode(r).value AS source, endNode(r).value AS target, count(*) AS count"
+# Without stopwords, paths through any of the $stopwords are removed by Neo4j while it expands them, so they are never
+# counted or sent. The predicate only uses parameters, so it is formatted into a query as a second cached plan per depth
+STOPWORD_PATH_PREDICATE = "NONE(n IN nodes(p) WHERE n.value IN $stopwords)"
+# Sent as the $stopwords parameter, sorted so every query sends the same list
+STOPWORD_PARAMETER = sorted(eng_stopwords)
+
+
+def format_depth(query: str, depth: int, include_stopwords: bool = True) -> str:
+    """Formats the max path length, the only part of a query that can not be a parameter, and the stopword filter into a query
+
+    Args:
+        query (str): The query, with a {depth} placeholder, and a {where_no_stopwords} or {and_no_stopwords} placeholder
+        depth (int): The max path length
+        include_stopwords (bool, optional): If false, paths containing stopwords are filtered out,
+            and the query needs the $stopwords parameter. Defaults to True.
+
+    Raises:
+        ValueError: If the depth is not a positive integer
+
+    Returns:
+        str: The query for the given depth
+    """
+    depth = int(depth)
+    if depth < 1:
+        raise ValueError(f"The path length must be at least 1, not {depth}")
+    if include_stopwords:
+        return query.format(depth=depth, where_no_stopwords="", and_no_stopwords="")
+    return query.format(depth=depth, where_no_stopwords=f" WHERE {STOPWORD_PATH_PREDICATE}",
+                        and_no_stopwords=f" AND {STOPWORD_PATH_PREDICATE}")
+
+
+def query_parameters(include_stopwords: bool, **parameters) -> dict:
+    """Gets the parameters of a query, adding the $stopwords parameter if stopwords are filtered out
+
+    Args:
+        include_stopwords (bool): Whether or not the query includes paths containing stopwords
+        **parameters: The other parameters of the query
+
+    Returns:
+        dict: The parameters of the query
+    """
+    if not include_stopwords:
+        parameters["stopwords"] = STOPWORD_PARAMETER
+    return parameters
+
 
 class Neo4jDriverManager:
 
@@ -36,10 +111,10 @@ class Neo4jDriverManager:
         self.session.close()
         self.driver.close()
 
-    def get_word_result(self, word: str) -> list[tuple[str, str]]:
+    def get_word_result(self, word: str, path_length: int = 3) -> list[tuple[str, str]]:
         sub_start = time.time()
         result = self.tx.run(
-            f"MATCH (w:Word) USING TEXT INDEX w:Word(value) WHERE w.value = '{word}' MATCH p = (w)-[:HAS_WORD*1..3]->(:Word) RETURN p;")
+            format_depth(WORD_PATHS_QUERY, path_length), word=word)
         print(time.time() - sub_start)
         word_result = [record for record in result]
         graph_tuples = self.parse_records(word_result)
@@ -56,69 +131,194 @@ class Neo4jDriverManager:
 class Neo4jHTTPManager:
     """
     A Class that manages the connection and queries to the Neo4j database, 
-    along with the parsing of the data for visualization
+    along with the parsing of the data for visualization.
+    A single session with a pool of keep-alive connections is shared by every query, and is safe to use
+    from the threads of the app, so one manager (get_neo4j_manager) should be used by the whole process
     """
 
-    def __init__(self):
+    def __init__(self, endpoint: str = NEO4J_HTTP_ENDPOINT, pool_size: int = NEO4J_POOL_SIZE,
+                 timeout: Union[float, tuple[float, float]] = NEO4J_TIMEOUT, max_retries: int = NEO4J_MAX_RETRIES):
         username, password = AUTH
         credentials = f"{username}:{password}"
         credentials_b64 = base64.b64encode(credentials.encode()).decode()
         self.headers = {
             "Authorization": f"Basic {credentials_b64}"
         }
-        # Localhost for Self-Managed Neo4j Instance
-        self.endpoint = "http://localhost:7474/db/data/transaction/commit"
+        self.endpoint = endpoint
+        self.timeout = timeout
+        retries = Retry(total=max_retries, connect=max_retries, read=0, status=max_retries, other=0,
+                        backoff_factor=NEO4J_RETRY_BACKOFF, status_forcelist=NEO4J_RETRY_STATUSES,
+                        allowed_methods=frozenset(["POST"]), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=pool_size, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # The headers are only set once, and sent with every request of the session
+        self.session.headers.update(self.headers)
+
+    def close(self):
+        '''Close the connections of the session'''
+        self.session.close()
+
+    def explain(self, statement: str, parameters: dict) -> dict:
+        """Gets the plan Neo4j makes for a query without running it, by prefixing it with EXPLAIN
 
-    def get_word_rows(self, spec_response: Result, include_stopwords: bool) -> Counter[tuple[str, str]]:
+        Args:
+            statement (str): The Cypher statement
+            parameters (dict): The parameters of the statement
+
+        Returns:
+            dict: The plan of the query, as returned by the Neo4j HTTP API
+        """
+        query = {
+            "statements": [
+                {
+                    "statement": f"EXPLAIN {statement}",
+                    "parameters": parameters,
+                    "resultDataContents": ["row"]
+                }
+            ]
+        }
+        return json.loads(self.post_query(query))["results"][0]["plan"]
+
+    def post_query(self, query: dict) -> bytes:
+        """Sends the statements of a query to the Neo4j HTTP API over the shared session
+
+        Args:
+            query (dict): The query, with the statements to run
+
+        Returns:
+            bytes: The raw bytes of the response content from Neo4j
+        """
+        response = self.session.post(
+            self.endpoint, json=query, timeout=self.timeout)
+        return response.content
+
+    def post_query_stream(self, query: dict) -> Iterator[bytes]:
+        """Sends the statements of a query to the Neo4j HTTP API over the shared session, without waiting for the whole response
+
+        Args:
+            query (dict): The query, with the statements to run
+
+        Yields:
+            Iterator[bytes]: The response content from Neo4j, in chunks of up to NEO4J_STREAM_CHUNK_SIZE bytes
+        """
+        # The connection goes back to the pool once the response has been read (or the generator is closed)
+        with self.session.post(self.endpoint, json=query, timeout=self.timeout, stream=True) as response:
+            yield from response.iter_content(chunk_size=NEO4J_STREAM_CHUNK_SIZE)
+
+    def get_word_rows(self, spec_response: PathResult, include_stopwords: bool) -> Counter[tuple[str, str]]:
         """Parses the msgspec response object into a Counter object of word, word tuples 
 
         Args:
-            spec_response (bytes): The parsed json object from msgspec
+            spec_response (PathResult): The parsed json object from msgspec
             include_stopwords (bool): Whether or not to inlude stopwords in the result
 
         Returns:
             Counter[tuple[str, str]]: Counter object of each tuple of word, word
         """
+        return self.count_path_edges(spec_response.results[0].data, include_stopwords)
+
+    def count_path_edges(self, records: Iterable[PathRecord], include_stopwords: bool) -> Counter[tuple[str, str]]:
+        """Counts the word, word relationships of path records as they are iterated, without keeping the paths
+
+        Args:
+            records (Iterable[PathRecord]): The path records, from a decoded response or a stream of records
+            include_stopwords (bool): Whether or not to inlude paths containing stopwords
+
+        Returns:
+            Counter[tuple[str, str]]: Counter object of each tuple of word, word
+        """
+        # Nodes and relationships alternate in each path, so the words are every other element
+        paths = ([node.value for node in record.row.path[::2]]
+                 for record in records)
         if not include_stopwords:
-            # Create list of tuples containing the word, word relationships, removing all empty nodes
-            paths = [tuple(pairwise([d['value'] for d in data.row[0] if d]))
-                     for data in spec_response.results[0].data]
             # Removing paths that contain any stopwords
-            no_stopword_paths = [path for path in paths if not bool(
-                eng_stopwords & set(chain.from_iterable(path)))]
-            # Chaining the unique relationships into a set of node, node
-            return Counter(chain.from_iterable(no_stopword_paths))
-        else:
-            return Counter(chain.from_iterable([tuple(pairwise([d['value'] for d in data.row[0] if d])) for data in spec_response.results[0].data]))
-
-    def get_word_paths_raw(self, value: str, path_length: int) -> bytes:
+            paths = (path for path in paths if eng_stopwords.isdisjoint(path))
+        # Chaining the word, word relationships of every path
+        return Counter(chain.from_iterable(pairwise(path) for path in paths))
+
+    def get_edge_counts(self, spec_response: EdgeResult) -> Counter[tuple[str, str]]:
+        """Converts the msgspec response of an edge query, already aggregated by Neo4j, into a Counter object of word, word tuples
+
+        Args:
+            spec_response (EdgeResult): The parsed json object from msgspec
+
+        Returns:
+            Counter[tuple[str, str]]: Counter object of each tuple of word, word
+        """
+        return Counter({(source, target): count for source, target, count in
+                        (data.row for data in spec_response.results[0].data)})
+
+    def get_word_edges_raw(self, value: str, path_length: int, include_stopwords: bool = True) -> bytes:
+        """Makes the request to the Neo4j database to run the query that counts the relationships of all paths
+            connected to the word (value) up to a certain path length, and returns the content of the response
+
+        Args:
+            value (str): The word value to start the search from
+            path_length (int): The max path length to get data of
+            include_stopwords (bool, optional): Whether or not to inlude paths containing stopwords,
+                paths with stopwords are filtered out by Neo4j. Defaults to True.
+
+        Returns:
+            bytes: The raw bytes of the response content from Neo4j
+        """
+        query = {
+            "statements": [
+                {
+                    "statement": format_depth(WORD_EDGES_QUERY, path_length, include_stopwords),
+                    "parameters": query_parameters(include_stopwords, word=value),
+                    "resultDataContents": ["row"]
+                }
+            ]
+        }
+        return self.post_query(query)
+
+    def get_two_word_edges_raw(self, first_word: str, second_word: str, max_path_length: int,
+                               include_stopwords: bool = True) -> bytes:
+        """Makes the request to the Neo4j database to run the query that counts the relationships of all paths
+            that connect two words together up to a certain path length, and returns the content of the response
+
+        Args:
+            first_word (str): The word value to start the search from
+            second_word (str): The second word value to find a connecting path with
+            max_path_length (int): The max path length to search for a connection between the two words
+            include_stopwords (bool, optional): Whether or not to inlude paths containing stopwords,
+                paths with stopwords are filtered out by Neo4j. Defaults to True.
+
+        Returns:
+            bytes: The raw bytes of the response content from Neo4j
+        """
+        query = {
+            "statements": [
+                {
+                    "statement": format_depth(TWO_WORD_EDGES_QUERY, max_path_length, include_stopwords),
+                    "parameters": query_parameters(include_stopwords, first_word=first_word, second_word=second_word),
+                    "resultDataContents": ["row"]
+                }
+            ]
+        }
+        return self.post_query(query)
+
+    def get_word_paths_raw(self, value: str, path_length: int, include_stopwords: bool = True) -> bytes:
         """Makes the request to the Neo4j database to run the query that finds all paths connected to the word (value) up to a certain path length 
             and returns the content of the response
 
         Args:
             value (str): The word value to start the search from
             path_length (int): The max path length to get data of
+            include_stopwords (bool, optional): Whether or not to inlude paths containing stopwords,
+                paths with stopwords are filtered out by Neo4j. Defaults to True.
 
         Returns:
             bytes: The raw bytes of the response content from Neo4j
         """
-        with requests.Session() as session:
-            # Define the Neo4j query
-            query = {
-                "statements": [
-                    {
-                        "statement": f"MATCH (w:Word) USING TEXT INDEX w:Word(value) WHERE w.value = '{value}' MATCH p = (w)-[:HAS_WORD*1..{path_length}]->(:Word) RETURN p;",
-                        "resultDataContents": ["row"]
-                    }
-                ]
-            }
-
-            # Send the request to the Neo4j endpoint
-            response = session.post(
-                self.endpoint, json=query, headers=self.headers)
-            return response.content
-
-    def get_two_word_paths_raw(self, first_word: str, second_word: str, max_path_length: int) -> bytes:
+        # Send the request to the Neo4j endpoint
+        return self.post_query(self.word_paths_query(value, path_length, include_stopwords))
+
+    def get_two_word_paths_raw(self, first_word: str, second_word: str, max_path_length: int,
+                               include_stopwords: bool = True) -> bytes:
         """Makes the request to the Neo4j database to run the query that finds all paths that connect two words together up to a certain path length 
             and returns the content of the response
 
@@ -126,59 +326,142 @@ class Neo4jHTTPManager:
             first_word (str): The word value to start the search from
             second_word (str): The second word value to find a connecting path with
             path_length (int): The max path length to search for a connection between the two words
+            include_stopwords (bool, optional): Whether or not to inlude paths containing stopwords,
+                paths with stopwords are filtered out by Neo4j. Defaults to True.
 
         Returns:
             bytes: The raw bytes of the response content from Neo4j
         """
+        # Send the request to the Neo4j endpoint
+        return self.post_query(self.two_word_paths_query(first_word, second_word, max_path_length, include_stopwords))
+
+    def word_paths_query(self, value: str, path_length: int, include_stopwords: bool = True) -> dict:
+        """Builds the query that finds all paths connected to the word (value) up to a certain path length
 
-        with requests.Session() as session:
-            # Define the Neo4j query
-            query = {
-                "statements": [
-                    {
-                        "statement": f"MATCH p=(start:Word)-[:HAS_WORD*1..{max_path_length}]->(end:Word) WHERE start.value = '{first_word}' AND end.value = '{second_word}' RETURN p ORDER BY length(p) ASC",
-                        "resultDataContents": ["row"]
-                    }
-                ]
-            }
-
-            # Send the request to the Neo4j endpoint
-            response = session.post(
-                self.endpoint, json=query, headers=self.headers)
-            return response.content
-
-    def get_word_data(self, value: str, path_length: int, include_stopwords: bool) -> Counter[tuple[str, str]]:
+        Args:
+            value (str): The word value to start the search from
+            path_length (int): The max path length to get data of
+            include_stopwords (bool, optional): Whether or not to inlude paths containing stopwords,
+                paths with stopwords are filtered out by Neo4j. Defaults to True.
+
+        Returns:
+            dict: The query, with the statement to run
+        """
+        return {
+            "statements": [
+                {
+                    "statement": format_depth(WORD_PATHS_QUERY, path_length, include_stopwords),
+                    "parameters": query_parameters(include_stopwords, word=value),
+                    "resultDataContents": ["row"]
+                }
+            ]
+        }
+
+    def two_word_paths_query(self, first_word: str, second_word: str, max_path_length: int,
+                             include_stopwords: bool = True) -> dict:
+        """Builds the query that finds all paths that connect two words together up to a certain path length
+
+        Args:
+            first_word (str): The word value to start the search from
+            second_word (str): The second word value to find a connecting path with
+            max_path_length (int): The max path length to search for a connection between the two words
+            include_stopwords (bool, optional): Whether or not to inlude paths containing stopwords,
+                paths with stopwords are filtered out by Neo4j. Defaults to True.
+
+        Returns:
+            dict: The query, with the statement to run
+        """
+        return {
+            "statements": [
+                {
+                    "statement": format_depth(TWO_WORD_PATHS_QUERY, max_path_length, include_stopwords),
+                    "parameters": query_parameters(include_stopwords, first_word=first_word, second_word=second_word),
+                    "resultDataContents": ["row"]
+                }
+            ]
+        }
+
+    def get_word_data(self, value: str, path_length: int, include_stopwords: bool,
+                      aggregate: bool = True, stream: bool = True) -> Counter[tuple[str, str]]:
         """Gets the words connected to the starting word up to a depth specified by path_length
 
         Args:
             value (str): The word value to start the search from
             path_length (int): The maximum depth/path length of definitions to get the words of
+            include_stopwords (bool): Whether or not to inlude paths containing stopwords
+            aggregate (bool, optional): If true, Neo4j counts the relationships and only returns the distinct edges,
+                instead of every path. Defaults to True.
+            stream (bool, optional): If true, the paths are counted as the response arrives instead of after
+                the whole response has been read and decoded. Defaults to True.
 
         Returns:
             Counter[tuple[str, str]]: Node, Node relationships representing the network of words connected to the starting word
         """
-        word_path = self.get_word_paths_raw(value, path_length)
-        raw_data = decode(word_path, type=Result)
-        return self.get_word_rows(raw_data, include_stopwords)
-
-    def get_two_word_data(self, first_word: str, second_word: str, path_length: int, include_stopwords: bool) -> Counter[tuple[str, str]]:
+        # Paths with stopwords are already removed by Neo4j, so the paths returned are never filtered again
+        if aggregate:
+            return self.get_edge_counts(decode(self.get_word_edges_raw(value, path_length, include_stopwords),
+                                               type=EdgeResult))
+        if stream:
+            records = iter_records(self.post_query_stream(
+                self.word_paths_query(value, path_length, include_stopwords)))
+            return self.count_path_edges(records, include_stopwords=True)
+        word_path = self.get_word_paths_raw(
+            value, path_length, include_stopwords)
+        raw_data = decode(word_path, type=PathResult)
+        return self.get_word_rows(raw_data, include_stopwords=True)
+
+    def get_two_word_data(self, first_word: str, second_word: str, path_length: int, include_stopwords: bool,
+                          aggregate: bool = True, stream: bool = True) -> Counter[tuple[str, str]]:
         """Gets the word paths that connect two words, and parses the data into a list of tuples representing the nodes and relationships
 
         Args:
             first_word (str): The word to connect to the second word
             second_word (str): The second word to be connected to
             path_length (int): The maximum path length to search for when attempting to connect both words
+            include_stopwords (bool): Whether or not to inlude paths containing stopwords
+            aggregate (bool, optional): If true, Neo4j counts the relationships and only returns the distinct edges,
+                instead of every path. Defaults to True.
+            stream (bool, optional): If true, the paths are counted as the response arrives instead of after
+                the whole response has been read and decoded. Defaults to True.
 
         Returns:
             Counter[tuple[str, str]]: Node, Node relationships representing the paths between both words
         """
+        # Paths with stopwords are already removed by Neo4j, so the paths returned are never filtered again
+        if aggregate:
+            return self.get_edge_counts(decode(self.get_two_word_edges_raw(first_word, second_word, path_length,
+                                                                           include_stopwords), type=EdgeResult))
+        if stream:
+            records = iter_records(self.post_query_stream(
+                self.two_word_paths_query(first_word, second_word, path_length, include_stopwords)))
+            return self.count_path_edges(records, include_stopwords=True)
         # Get the JSON Path bytes from the HTTP api
         word_path = self.get_two_word_paths_raw(
-            first_word, second_word, path_length)
-        # Decode the bytes using MsgSpec and the Result Struct
-        raw_data = decode(word_path, type=Result)
+            first_word, second_word, path_length, include_stopwords)
+        # Decode the bytes using MsgSpec and the PathResult Struct
+        raw_data = decode(word_path, type=PathResult)
         # Return the rows of the decoded data
-        return self.get_word_rows(raw_data, include_stopwords)
+        return self.get_word_rows(raw_data, include_stopwords=True)
+
+
+# Process-wide manager shared by all of the callbacks, created on first use
+_neo4j_manager: Union[Neo4jHTTPManager, None] = None
+_neo4j_manager_lock = Lock()
+
+
+def get_neo4j_manager() -> Neo4jHTTPManager:
+    """Gets the process-wide Neo4jHTTPManager, so every query reuses the same pool of connections
+
+    Returns:
+        Neo4jHTTPManager: The shared manager
+    """
+    global _neo4j_manager
+    if _neo4j_manager is None:
+        with _neo4j_manager_lock:
+            # Another thread may have already created the manager while waiting for the lock
+            if _neo4j_manager is None:
+                _neo4j_manager = Neo4jHTTPManager()
+    return _neo4j_manager
 
 
 if __name__ == "__main__":
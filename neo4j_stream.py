@@ -0,0 +1,56 @@
+# Incremental decoding of Neo4j HTTP API responses, record by record, as the body of the response arrives
+#
+# A response with resultDataContents ["row"] looks like:
+#   {"results":[{"columns":[...],"data":[{"row":[...],"meta":[...]},{"row":[...],"meta":[...]},...]}],"errors":[]}
+# Inside a JSON string a double quote is always escaped, so the bytes {"row": only ever appear at the start of a record.
+# Every record before the last {"row": in the buffer is complete, and is decoded with the other complete records of
+# the buffer in a single msgspec call. The last record is only decoded once the whole body has arrived
+
+from typing import Iterable, Iterator
+
+from msgspec import Struct
+from msgspec.json import decode
+
+from msgspec_custom_structs import PathRecord, PathResult
+
+# The start of every record of the data array
+RECORD_MARKER = b'{"row":'
+
+
+def iter_records(chunks: Iterable[bytes], record_type: type[Struct] = PathRecord,
+                 result_type: type[Struct] = PathResult) -> Iterator[Struct]:
+    """Decodes the records of a response from its chunks, only keeping the bytes of the records not decoded yet in memory
+
+    Args:
+        chunks (Iterable[bytes]): The body of the response, in chunks of any size
+        record_type (type[Struct], optional): The struct of a single record of the data array. Defaults to PathRecord.
+        result_type (type[Struct], optional): The struct of the whole response. Defaults to PathResult.
+
+    Yields:
+        Iterator[Struct]: Each record of the first result, in order
+    """
+    batch_type = list[record_type]
+    # The bytes of the response before the first record, kept to decode the last record as a whole response
+    prefix = None
+    buffer = bytearray()
+    for chunk in chunks:
+        # Only searching the new bytes (and a possibly split marker before them)
+        search_start = max(len(buffer) - len(RECORD_MARKER) + 1, 0)
+        buffer += chunk
+        if prefix is None:
+            first = buffer.find(RECORD_MARKER, search_start)
+            if first == -1:
+                continue
+            prefix = bytes(buffer[:first])
+            del buffer[:first]
+            search_start = 0
+        last = buffer.rfind(RECORD_MARKER, max(search_start, 1))
+        if last == -1:
+            continue
+        # The records before the last marker, without the comma separating them from it
+        records = buffer[:last].rstrip().removesuffix(b",")
+        yield from decode(b"[" + records + b"]", type=batch_type)
+        del buffer[:last]
+    # The prefix and the last record (or the whole body, if it had no records) are the rest of the response
+    response = decode(bytes(buffer) if prefix is None else prefix + buffer, type=result_type)
+    yield from response.results[0].data
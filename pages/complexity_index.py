@@ -1,39 +1,60 @@
-from pandas import read_csv
-
 import dash
 import dash_cytoscape as cyto
 import dash_bootstrap_components as dbc
 from dash import html, Input, Output, dcc
 
 from components import complexity_calculations
-from utils import complexity_index, get_wikipedia_summary
+from utils import get_wikipedia_summary
+from word_frequency_index import get_frequency_index
+from incremental_complexity import IncrementalComplexityScorer
+from complexity_cache import ComplexityResultCache
 
 dash.register_page(__name__, path='/Complexity-Index')
 
+# Loading the values used in calculating the index once, when the app starts. This is only a warm-up, if the index
+# has not been built yet the page still registers, and the callback loads it once it exists
+try:
+    get_frequency_index()
+except OSError:
+    pass
+# Keeps the scores of each sentence, so resubmitting an edited text only scores the sentences that changed
+complexity_scorer = IncrementalComplexityScorer()
+# Keeps the results of whole texts, for the sample texts and documents that are submitted again and again
+result_cache = ComplexityResultCache()
+
 
 @dash.callback(Output("complexity-index-output", 'children'),
                Output("unknown-word-list", "children"),
                Output("submit-text-complexity", 'n_clicks'),
                Input("submit-text-complexity", 'n_clicks'),
                Input('complexity-text-input', 'value'),
-               Input('use-wikipedia-summaries', 'value'))
-def complexity_index_calculator(n_clicks: int, text: str, use_wikipedia_summaries: bool) -> tuple[str, str, int]:
+               Input('use-wikipedia-summaries', 'value'),
+               Input('complexity-metric', 'value'))
+def complexity_index_calculator(n_clicks: int, text: str, use_wikipedia_summaries: bool, metric: str) -> tuple[str, str, int]:
     """The main callback for calculating the complexity of the input text.
-    Uses the Complexity_Index function from utils to calculate the index based on
-    the text input from the text box
+    Uses the IncrementalComplexityScorer to calculate the index based on
+    the text input from the text box, only scoring the sentences that changed since the last submit,
+    and returns the cached result for texts that were already submitted
 
     Args:
         n_clicks (int): Number of clicks on the Submit button
         text (str): The text inside the text box
+        metric (str): The value of each word to average, frequency or one of the graph metrics
 
     Returns:
         str: The complexity index of the submitted text
     """
-    # Reading the csv file containing the values used in calculating the index
-    df = read_csv("./data/word_complexity_index.csv")
     if n_clicks > 0:
-        complexity_index_value, unknown_words = complexity_index(
-            df, text, use_wikipedia_summaries)
+        # Getting the shared index of values used in calculating the index, reloaded only if the file changed
+        try:
+            frequency_index = get_frequency_index()
+        except OSError:
+            return "Complexity Index: the word complexity index has not been built yet (run build_word_complexity_index.py)", "Unknown Words/Terms: ", 0
+        if metric not in frequency_index.metrics:
+            return f"Complexity Index: the {metric} values have not been built yet (run graph_metrics.py)", "Unknown Words/Terms: ", 0
+        frequency_index = frequency_index.with_metric(metric)
+        complexity_index_value, unknown_words = result_cache.complexity_index(
+            frequency_index, text, use_wikipedia_summaries, scorer=complexity_scorer.complexity_index)
         return "Complexity Index: " + complexity_index_value, f"Unknown Words/Terms: {', '.join(unknown_words)}", 0
     else:
         return "Complexity Index:", "Unknown Words/Terms: ", 0
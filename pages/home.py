@@ -6,7 +6,7 @@ import dash_bootstrap_components as dbc
 from dash import html, Input, Output, dcc, ctx
 
 from components import *
-from neo4j_manager import Neo4jHTTPManager
+from neo4j_manager import get_neo4j_manager
 
 from nltk.corpus import stopwords
 eng_stopwords = set(stopwords.words('english'))
@@ -95,7 +95,7 @@ def generateGraph(n_clicks: int, word_value: str, depth_value: int, include_stop
     """
     # Cytoscape Element Generation
     if n_clicks > 0 and word_value and depth_value:
-        database = Neo4jHTTPManager()
+        database = get_neo4j_manager()
         initial_value = word_value.strip()
         word_data = database.get_word_data(
             initial_value, depth_value, include_stopwords)
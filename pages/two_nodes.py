@@ -8,7 +8,7 @@ import dash_bootstrap_components as dbc
 from dash import html, Input, Output, dcc, ctx
 
 from components import *
-from neo4j_manager import Neo4jHTTPManager
+from neo4j_manager import get_neo4j_manager
 
 from nltk.corpus import stopwords
 eng_stopwords = set(stopwords.words('english'))
@@ -110,7 +110,7 @@ def generateGraph(n_clicks: int, first_word: str, second_word: str, depth_value:
     """
     # Cytoscape Element Generation
     if n_clicks > 0 and first_word and second_word and depth_value:
-        database = Neo4jHTTPManager()  # Create an instance of the Neo4j Database Manager
+        database = get_neo4j_manager()  # The shared Neo4j Database Manager, reusing its connections
         initial_value = first_word.strip()
         word_data = database.get_two_word_data(
             initial_value, second_word.strip(), depth_value, include_stopwords)
@@ -0,0 +1,191 @@
+# Command line tool for scoring a whole corpus of documents with the complexity index, across all cores
+#
+# Usage:
+#   python score_corpus.py ./articles/ -o scores.jsonl
+#   python score_corpus.py "./articles/**/*.txt" -o scores.csv --format csv
+#   python score_corpus.py documents.jsonl --text-field body --id-field url -o scores.jsonl
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+from multiprocessing import get_context, get_all_start_methods
+from typing import Iterator, Union, TextIO
+
+from utils import prep_complexity_index_text, sum_word_complexities, get_unknown_words_complexities
+from word_frequency_index import WordFrequencyIndex, default_index_path
+
+# Set in the parent process before the pool is created, so forked workers share it copy-on-write
+_frequency_index: Union[WordFrequencyIndex, None] = None
+_use_wikipedia_summaries = False
+
+OUTPUT_FIELDS = ["id", "complexity_index", "word_count", "unknown_words"]
+
+
+def iter_documents(source: str, text_field: str = "text", id_field: str = "id") -> Iterator[tuple[str, str]]:
+    """Lazily reads the documents to be scored from a directory, a glob pattern or a JSONL file
+
+    Args:
+        source (str): A directory (every .txt file in it is read), a glob pattern, or a .jsonl file
+        text_field (str, optional): The field of each JSONL record containing the text. Defaults to "text".
+        id_field (str, optional): The field of each JSONL record containing its id, the line number is used
+            if the field is missing. Defaults to "id".
+
+    Yields:
+        Iterator[tuple[str, str]]: The id and text of each document
+    """
+    if source.endswith(".jsonl") and os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    record = json.loads(line)
+                    yield str(record.get(id_field, line_number)), record[text_field]
+        return
+    if os.path.isdir(source):
+        paths = glob.iglob(os.path.join(source, "**", "*.txt"), recursive=True)
+    else:
+        paths = glob.iglob(source, recursive=True)
+    for path in paths:
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                yield path, f.read()
+
+
+def _init_worker(frequency_index_path: str, use_wikipedia_summaries: bool) -> None:
+    """Sets up a worker process, only loading the frequency table if it was not inherited from the parent process
+
+    Args:
+        frequency_index_path (str): The path to the binary or csv word complexity index
+        use_wikipedia_summaries (bool): Whether or not to replace unknown words with their wikipedia summaries
+    """
+    global _frequency_index, _use_wikipedia_summaries
+    if _frequency_index is None:
+        _frequency_index = WordFrequencyIndex.from_path(frequency_index_path)
+    _use_wikipedia_summaries = use_wikipedia_summaries
+
+
+def score_document(document: tuple[str, str]) -> dict:
+    """Calculates the complexity index of a single document, the same way as utils.complexity_index
+
+    Args:
+        document (tuple[str, str]): The id and text of the document
+
+    Returns:
+        dict: The id, complexity index (None if no words were known), number of known words and unknown words
+    """
+    document_id, text = document
+    index, count, unknown_words = sum_word_complexities(
+        _frequency_index, prep_complexity_index_text(text))
+    if _use_wikipedia_summaries:
+        unknowns_index, unknowns_count = get_unknown_words_complexities(
+            _frequency_index, unknown_words)
+        index += unknowns_index
+        count += unknowns_count
+    return {
+        "id": document_id,
+        "complexity_index": index / count if count != 0 else None,
+        "word_count": count,
+        "unknown_words": unknown_words
+    }
+
+
+def write_results(results: Iterator[dict], output: TextIO, output_format: str) -> int:
+    """Writes each result to the output as soon as it is available
+
+    Args:
+        results (Iterator[dict]): The scored documents
+        output (TextIO): The file to write to
+        output_format (str): Either jsonl or csv
+
+    Returns:
+        int: The number of documents written
+    """
+    written = 0
+    if output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(
+                {**result, "unknown_words": " ".join(result["unknown_words"])})
+            written += 1
+    else:
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            written += 1
+    return written
+
+
+def score_corpus(source: str, output: TextIO, output_format: str = "jsonl", processes: Union[int, None] = None,
+                 frequency_index_path: Union[str, None] = None, use_wikipedia_summaries: bool = False,
+                 text_field: str = "text", id_field: str = "id", chunksize: int = 16) -> int:
+    """Scores every document of the corpus with a pool of worker processes, streaming the results to the output
+    in the order they finish
+
+    Args:
+        source (str): A directory, glob pattern or .jsonl file of documents
+        output (TextIO): The file to write the results to
+        output_format (str, optional): Either jsonl or csv. Defaults to "jsonl".
+        processes (Union[int, None], optional): Number of worker processes, all cores if None. Defaults to None.
+        frequency_index_path (Union[str, None], optional): Path to the binary or csv word complexity index,
+            the default table if None. Defaults to None.
+        use_wikipedia_summaries (bool, optional): Replace unknown words with their wikipedia summaries. Defaults to False.
+        text_field (str, optional): The text field of JSONL records. Defaults to "text".
+        id_field (str, optional): The id field of JSONL records. Defaults to "id".
+        chunksize (int, optional): Number of documents sent to a worker at a time. Defaults to 16.
+
+    Returns:
+        int: The number of documents scored
+    """
+    global _frequency_index
+    frequency_index_path = frequency_index_path or default_index_path()
+    # Loading the table before forking, so every worker shares the parent's copy
+    _frequency_index = WordFrequencyIndex.from_path(frequency_index_path)
+    # Fork is not available on Windows, there each worker loads its own copy of the table instead
+    start_method = "fork" if "fork" in get_all_start_methods() else "spawn"
+    with get_context(start_method).Pool(processes, initializer=_init_worker,
+                                        initargs=(frequency_index_path, use_wikipedia_summaries)) as pool:
+        results = pool.imap_unordered(
+            score_document, iter_documents(source, text_field, id_field), chunksize=chunksize)
+        return write_results(results, output, output_format)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calculate the complexity index of every document in a corpus")
+    parser.add_argument(
+        "source", help="A directory of .txt files, a glob pattern, or a .jsonl file of documents")
+    parser.add_argument("-o", "--output", default="-",
+                        help="File to write the results to, defaults to stdout")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"], default=None,
+                        help="Output format, guessed from the output file extension if not given")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="Number of worker processes, defaults to the number of cores")
+    parser.add_argument("--frequency-index", default=None,
+                        help="Path to the binary or csv word complexity index, defaults to the binary table if it has been built")
+    parser.add_argument("--use-wikipedia-summaries", action="store_true",
+                        help="Replace unknown words/terms with their Wikipedia summaries")
+    parser.add_argument("--text-field", default="text",
+                        help="Field containing the text of each JSONL record")
+    parser.add_argument("--id-field", default="id",
+                        help="Field containing the id of each JSONL record")
+    args = parser.parse_args()
+
+    output_format = args.format or (
+        "csv" if args.output.endswith(".csv") else "jsonl")
+    start = time.time()
+    if args.output == "-":
+        scored = score_corpus(args.source, sys.stdout, output_format, args.processes, args.frequency_index,
+                              args.use_wikipedia_summaries, args.text_field, args.id_field)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as output:
+            scored = score_corpus(args.source, output, output_format, args.processes, args.frequency_index,
+                                  args.use_wikipedia_summaries, args.text_field, args.id_field)
+    print(f"Scored {scored} documents in {time.time() - start:.2f}s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Tests of get_wikipedia_summaries against a local stand-in for the Wikipedia REST API
+#
+# Usage:
+#   python -m unittest discover tests
+
+import json
+import time
+import unittest
+import threading
+from unittest import mock
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import utils
+
+# Seconds each stand-in request takes, so concurrent requests overlap
+RESPONSE_DELAY = 0.05
+# Page names answered with a 404, and page names answered after the request timeout
+MISSING_PAGES = {"missing"}
+SLOW_PAGES = {"slow"}
+REQUEST_TIMEOUT = 0.5
+
+
+class StandInState:
+    """Requests seen by the stand-in server, and the most requests it was handling at the same time"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StandInState
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        page_name = self.path.rsplit("/", 1)[-1]
+        state = self.state
+        with state.lock:
+            state.requests[page_name] += 1
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            time.sleep(REQUEST_TIMEOUT * 2 if page_name in SLOW_PAGES else RESPONSE_DELAY)
+            if page_name in MISSING_PAGES:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({"extract": f"{page_name} text",
+                               "extract_html": f"<p>{page_name}</p>"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on a slow page
+            pass
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+
+class WikipediaSummariesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state = StandInState()
+        handler = type("Handler", (StandInHandler,), {"state": self.state})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        # Only the stand-in server is used, never the summary cache, the offline store or Wikipedia itself
+        for patcher in [mock.patch.object(utils, "WIKIPEDIA_SUMMARY_ENDPOINT",
+                                          f"http://127.0.0.1:{self.server.server_port}/summary/"),
+                        mock.patch.object(utils, "WIKIPEDIA_REQUEST_TIMEOUT", REQUEST_TIMEOUT),
+                        mock.patch.object(utils, "wikipedia_summary_cache", None),
+                        mock.patch.object(utils, "wikipedia_offline_summaries", None)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_duplicate_page_names_are_requested_once(self):
+        summaries = utils.get_wikipedia_summaries(
+            ["apple", "pear", "apple", "apple"], content_type="text")
+        self.assertEqual(summaries, ["apple text", "pear text", "apple text", "apple text"])
+        self.assertEqual(self.state.requests, Counter({"apple": 1, "pear": 1}))
+
+    def test_concurrency_is_bounded(self):
+        page_names = [f"page{i}" for i in range(4 * utils.WIKIPEDIA_MAX_CONCURRENT_REQUESTS)]
+        # Two calls at once, as from two callbacks, still share the same limit
+        results = [None, None]
+
+        def fetch(position):
+            results[position] = utils.get_wikipedia_summaries(page_names)
+
+        threads = [threading.Thread(target=fetch, args=(position,)) for position in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results[0], [f"<p>{page_name}</p>" for page_name in page_names])
+        self.assertEqual(results[0], results[1])
+        self.assertGreater(self.state.max_in_flight, 1)
+        self.assertLessEqual(self.state.max_in_flight, utils.WIKIPEDIA_MAX_CONCURRENT_REQUESTS)
+
+    def test_failed_requests_fall_back_to_the_page_name(self):
+        summaries = utils.get_wikipedia_summaries(
+            ["missing", "slow", "apple"], content_type="text")
+        self.assertEqual(summaries, ["missing", "slow", "apple text"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,81 @@
-from typing import Union
+import os
+from typing import Union, Iterable, Iterator, TextIO, TYPE_CHECKING
 from spacy import load
 import re
 from collections import Counter
+from functools import lru_cache
+from itertools import chain
+# Vectorized scoring of many documents at once
+import numpy as np
+from pandas import factorize, Series
+# pyarrow is optional, only needed for the type hints of definition columns read from parquet
+if TYPE_CHECKING:
+    import pyarrow
+# Compact storage of the precomputed lemma table
+from msgspec.msgpack import decode as msgpack_decode
 # Requests for Wikipedia Summaries
 import requests
-# Importing DataFrame for typing purposes
-from pandas import DataFrame
-# Loading english stopwords
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+# Parsing whole columns of definitions in parallel
+from multiprocessing import Pool
+# Hash-indexed word complexity values
+from word_frequency_index import WordFrequencyIndex, DEFAULT_METRIC
+# Compact word to id mappings, shared by the frequency index and the lemma table
+from vocabulary import LemmaTable, UNKNOWN_WORD_ID
+
+from versioned_files import write_versioned_file
+# Persistent cache of Wikipedia summaries shared by all app workers
+from wikipedia_cache import WikipediaSummaryCache
+# Offline Wikipedia summaries built from a local abstracts dump
+from wikipedia_offline import OfflineSummariesLoader
+# Loading english stopwords, only around 180 words so a set is kept rather than a Vocabulary
 from nltk.corpus import stopwords
 eng_stopwords = set(stopwords.words('english'))
 # NLP object for lemmatization
 nlp = load("en_core_web_sm")
+# Precomputed table of words to their lemmas, built in the mongo_to_neo4j notebook and memory-mapped by every process
+LEMMA_TABLE_PATH = "./data/word_lemmas.bin"
+# The table as saved before the binary format, only read (into memory) when the binary table has not been saved yet
+LEMMA_TABLE_MSGPACK_PATH = "./data/word_lemmas.msgpack"
+# Max number of spaCy lemmas kept in memory for words that are not in the lemma table
+LEMMA_CACHE_SIZE = 50_000
+# Pipeline components that are not needed for tokenizing and lemmatizing text for the complexity index
+SPACY_SCORING_DISABLED_PIPES = ["parser", "ner"]
+# spaCy splits clitics off their word ("john's" into "john" and "'s", "doesn't" into "does" and "n't"),
+# the regex tokenizer keeps them in the word, so they are not scored as words of their own
+SPACY_CLITIC_PREFIXES = ("'", "\u2019", "n't", "n\u2019t")
+# Number of characters read at a time when streaming text from a file
+STREAM_CHUNK_SIZE = 64 * 1024
+# Longest a sentence can grow while streaming before it is scored anyway, keeping memory bounded
+MAX_STREAM_SEGMENT_SIZE = 16 * 1024
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Number of definitions parsed by a worker at a time in basic_parser_series
+DEFINITION_CHUNK_SIZE = 20_000
+# Citations such as [1] and the characters removed from the text before calculating the complexity index
+CITATION = re.compile(r"\[.\]")
+UNWANTED_CHARACTERS = str.maketrans("", "", ":,.()[]\";")
+# Wikipedia REST API endpoint for page summaries
+WIKIPEDIA_SUMMARY_ENDPOINT = "https://en.wikipedia.org/api/rest_v1/page/summary/"
+# Max number of Wikipedia summaries fetched at the same time
+WIKIPEDIA_MAX_CONCURRENT_REQUESTS = 8
+# Seconds to wait for Wikipedia before giving up on a summary
+WIKIPEDIA_REQUEST_TIMEOUT = 5
+# Session shared by every Wikipedia request, keeping connections alive between requests
+wikipedia_session = requests.Session()
+wikipedia_session.mount("https://", HTTPAdapter(
+    pool_connections=1, pool_maxsize=WIKIPEDIA_MAX_CONCURRENT_REQUESTS))
+# Threads shared by every call of get_wikipedia_summaries, so the requests in flight are bounded for the whole process
+# (matching the session's pool) and each thread keeps its connection to the summary cache between calls
+wikipedia_executor = ThreadPoolExecutor(
+    max_workers=WIKIPEDIA_MAX_CONCURRENT_REQUESTS, thread_name_prefix="wikipedia")
+# Set to None to always fetch summaries from Wikipedia
+wikipedia_summary_cache: Union[WikipediaSummaryCache,
+                               None] = WikipediaSummaryCache()
+# When the offline store has been built, summaries are read from it instead of the Wikipedia API, a rebuilt store
+# is picked up without a restart. Set to None to never use the offline store
+wikipedia_offline_summaries: Union[OfflineSummariesLoader,
+                                   None] = OfflineSummariesLoader()
 
 
 def basic_parser(full_definition: str) -> str:
@@ -34,6 +99,48 @@ def basic_parser(full_definition: str) -> str:
     return cleaned.lower()
 
 
+def basic_parser_series(definitions: Union[Series, "pyarrow.Array", "pyarrow.ChunkedArray"],
+                        processes: Union[int, None] = 1, chunksize: int = DEFINITION_CHUNK_SIZE) -> Series:
+    """Parses a whole column of full definitions at once, producing the same output as basic_parser for each definition.
+    The column is parsed in a single loop by default (1-2s for 250k definitions). With more than one process,
+    its chunks are parsed in parallel by a pool of processes instead, which only pays off for much larger columns:
+    with the spawn start method (Windows) every worker imports utils again, loading the spaCy model and the lemma table,
+    and each chunk of definitions is pickled over to its worker
+
+    Args:
+        definitions (Union[Series, pyarrow.Array, pyarrow.ChunkedArray]): The full definition texts to be parsed
+        processes (Union[int, None], optional): Number of worker processes, all cores if None. Defaults to 1.
+        chunksize (int, optional): Number of definitions parsed by a worker at a time. Defaults to DEFINITION_CHUNK_SIZE.
+
+    Returns:
+        Series: The basic parsed string of each definition (missing definitions stay missing), with the same index as the definitions
+    """
+    if not isinstance(definitions, Series):
+        definitions = definitions.to_pandas()
+    values = definitions.tolist()
+    chunks = [values[start:start + chunksize]
+              for start in range(0, len(values), chunksize)]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(chunks) <= 1:
+        parsed_chunks = map(parse_definitions, chunks)
+    else:
+        with Pool(processes) as pool:
+            parsed_chunks = pool.map(parse_definitions, chunks)
+    return Series(list(chain.from_iterable(parsed_chunks)), index=definitions.index, dtype=object, name=definitions.name)
+
+
+def parse_definitions(definitions: list) -> list:
+    """Parses a list of full definitions with basic_parser, skipping missing definitions
+
+    Args:
+        definitions (list): The full definition texts to be parsed, missing definitions are kept as they are
+
+    Returns:
+        list: The basic parsed string of each definition
+    """
+    return [basic_parser(definition) if isinstance(definition, str) else definition for definition in definitions]
+
+
 def prep_definition_text(cleaned_definition: str, remove_stopwords: bool = True) -> set:
     """Prepares the definition text for graphing by removing all stopwords and returning a set of the words in the definition
 
@@ -65,42 +172,34 @@ def definition_word_counter(cleaned_definition: str, remove_stopwords: bool = Tr
         return Counter(cleaned_definition.lower().split())
 
 
-def complexity_index(df: DataFrame, text: str, use_wikipedia_summaries: bool) -> tuple[str, list[str]]:
+def complexity_index(frequency_index: WordFrequencyIndex, text: str, use_wikipedia_summaries: bool,
+                     use_spacy_pipeline: bool = False, metric: str = DEFAULT_METRIC) -> tuple[str, list[str]]:
     """Calculates an index for the complexity of the given text
 
     Args:
-        df (_type_): The Pandas Dataframe containing the values used in calculating the index
+        frequency_index (WordFrequencyIndex): The index of words to the values used in calculating the index
         text (str): The text to be calculated
+        use_wikipedia_summaries (bool): If true, unknown words are replaced by the words in their wikipedia summaries
+        use_spacy_pipeline (bool, optional): If true, the words and their lemmas are taken from a single
+            batched pass of the spaCy pipeline instead of lemmatizing each unknown word. Defaults to False.
+        metric (str, optional): The value of each word to average, frequency or one of the graph metrics
+            of the table (e.g. pagerank, in_degree or depth). Defaults to DEFAULT_METRIC.
 
     Returns:
         str: The average of the index values for each word,
         or a message warning the user that there are no words and therefore a division by zero was attempted
     """
-    index = 0
-    count = 0
-    unknown_words = []
+    frequency_index = frequency_index.with_metric(metric)
     # Cleaning the text provided, returning a list of all the words
-    cleaned_text = prep_complexity_index_text(text)
-    # Looping through all the words
-    for word in cleaned_text:
-        try:
-            # Trying to get the value for the word as is
-            index += float(df.frequency[df.word == word])
-            count += 1
-        except TypeError:  # Errors occur when the word is not in the dictionary
-            # Lemmatizing the word and trying again
-            word_lemma = get_lemma(word)
-            if word_lemma and word_lemma != word:
-                try:
-                    index += float(df.frequency[df.word == word_lemma])
-                    count += 1
-                except TypeError:
-                    unknown_words.append(word)
-            else:
-                unknown_words.append(word)
+    if use_spacy_pipeline:
+        cleaned_text, lemmas = prep_complexity_index_docs([text])
+    else:
+        cleaned_text, lemmas = prep_complexity_index_text(text), None
+    index, count, unknown_words = sum_word_complexities(
+        frequency_index, cleaned_text, lemmas)
     if use_wikipedia_summaries:
         unknowns_index, unknowns_count = get_unknown_words_complexities(
-            df, unknown_words)
+            frequency_index, unknown_words, use_spacy_pipeline)
         index += unknowns_index
         count += unknowns_count
     # Returning the average value of all the words
@@ -109,43 +208,259 @@ def complexity_index(df: DataFrame, text: str, use_wikipedia_summaries: bool) ->
     return average_index, unknown_words
 
 
-def get_unknown_words_complexities(df: DataFrame, unknown_words: list[str]) -> tuple[float, int]:
-    """A similar function to the complexity index, but it first gets the wikipedia summaries
-        of each unknown word and then gets their complexity values
+def sum_word_complexities(frequency_index: WordFrequencyIndex, words: list[str],
+                          lemmas: Union[list[str], None] = None) -> tuple[float, int, list[str]]:
+    """Totals the complexity values of the given words, falling back on the lemma of words not found in the index
 
     Args:
-        df (DataFrame): The dataframe containing the words and their complexity values
-        unknown_words (list[str]): The unknown words to first get the wikipedia summaries of
+        frequency_index (WordFrequencyIndex): The index of words to their complexity values
+        words (list[str]): The cleaned words to total the complexity values of
+        lemmas (Union[list[str], None], optional): The already computed lemma of each word,
+            if None the lemmas of unknown words are looked up with get_lemma. Defaults to None.
 
     Returns:
-        tuple[float, int]: The total of all the complexity values and the number of words/terms searched
+        tuple[float, int, list[str]]: The total of the complexity values, the number of words found, and the unknown words
     """
-    summaries = [get_wikipedia_summary(
-        unknown_word, content_type="text") for unknown_word in unknown_words]
-    summary_text = " ".join(summaries)
-    cleaned_text = prep_complexity_index_text(summary_text)
     index = 0
     count = 0
-    # Looping through all the words
-    for word in cleaned_text:
-        try:
-            # Trying to get the value for the word as is
-            index += float(df.frequency[df.word == word])
-            count += 1
-        except TypeError:  # Errors occur when the word is not in the dictionary
+    unknown_words = []
+    # Looking up all the words at once, then only lemmatizing the words that were not found
+    for position, (word, value) in enumerate(zip(words, frequency_index.lookup_many(words))):
+        if value is None:
             # Lemmatizing the word and trying again
-            word_lemma = get_lemma(word)
+            word_lemma = lemmas[position] if lemmas is not None else get_lemma(
+                word)
             if word_lemma and word_lemma != word:
-                try:
-                    index += float(df.frequency[df.word == word_lemma])
-                    count += 1
-                except TypeError:
-                    pass
+                value = frequency_index.get(word_lemma)
+        if value is None:
+            unknown_words.append(word)
+        else:
+            index += value
+            count += 1
+    return index, count, unknown_words
+
+
+def complexity_index_many(frequency_index: WordFrequencyIndex, texts: list[str]) -> tuple[np.ndarray, list[list[str]]]:
+    """Calculates the complexity index of many texts at once. Each distinct word is looked up (and lemmatized if needed)
+    only once across all the texts, and the per-text averages are computed with NumPy
+
+    Args:
+        frequency_index (WordFrequencyIndex): The index of words to the values used in calculating the index
+        texts (list[str]): The texts to be calculated
+
+    Returns:
+        tuple[np.ndarray, list[list[str]]]: The complexity index of each text (NaN for texts without any known words),
+        and the unknown words of each text
+    """
+    if not texts:
+        return np.empty(0, dtype=np.float64), []
+    # Cleaning each text, and flattening all the words into a single array
+    text_words = [prep_complexity_index_text(text) for text in texts]
+    all_words = np.fromiter(chain.from_iterable(text_words), dtype=object)
+    text_ids = np.repeat(np.arange(len(texts)), [
+                         len(words) for words in text_words])
+    # Mapping each distinct word to its vocabulary id, falling back on its lemma
+    codes, unique_words = factorize(all_words)
+    unique_ids = frequency_index.lookup_ids(unique_words)
+    for position in np.flatnonzero(unique_ids == UNKNOWN_WORD_ID):
+        word = unique_words[position]
+        word_lemma = get_lemma(word)
+        if word_lemma and word_lemma != word:
+            unique_ids[position] = frequency_index.word_id(word_lemma)
+    word_ids = unique_ids[codes]
+    # Summing the values and counting the known words of each text
+    known = word_ids != UNKNOWN_WORD_ID
+    known_text_ids = text_ids[known]
+    sums = np.bincount(known_text_ids, weights=frequency_index.frequencies[word_ids[known]],
+                       minlength=len(texts))
+    counts = np.bincount(known_text_ids, minlength=len(texts))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        averages = sums / counts
+    # Splitting the unknown words back into their texts, the text ids are already in order
+    unknown_positions = np.flatnonzero(~known)
+    splits = np.searchsorted(
+        text_ids[unknown_positions], np.arange(1, len(texts)))
+    unknown_words = [words.tolist()
+                     for words in np.split(all_words[unknown_positions], splits)]
+    return averages, unknown_words
+
+
+def stream_complexity_index(frequency_index: WordFrequencyIndex, source: Union[TextIO, Iterable[str]],
+                            per_sentence: bool = False, window_size: Union[int, None] = None) -> Iterator[dict]:
+    """Calculates the complexity index of a text that is read in chunks, keeping only a running total and count
+    in memory, so book-length texts can be scored in bounded memory with progressive results
+
+    Args:
+        frequency_index (WordFrequencyIndex): The index of words to the values used in calculating the index
+        source (Union[TextIO, Iterable[str]]): A file object, read STREAM_CHUNK_SIZE characters at a time,
+            or any iterator of text chunks such as lines
+        per_sentence (bool, optional): If true, a result is yielded after each sentence. Defaults to False.
+        window_size (Union[int, None], optional): If given, a result is yielded every window_size words. Defaults to None.
+
+    Yields:
+        Iterator[dict]: The complexity index and words of the latest sentence/window ("segment_index", "segment_count",
+        "unknown_words") along with the running complexity index of the whole text so far ("complexity_index", "word_count").
+        The last result yielded is always for the whole text, with "final" set to True
+    """
+    chunks = iter(lambda: source.read(STREAM_CHUNK_SIZE),
+                  "") if hasattr(source, "read") else source
+    total_index = 0
+    total_count = 0
+    segment_index = 0
+    segment_count = 0
+    segment_words = 0
+    segment_unknown_words = []
+
+    def result(final: bool) -> dict:
+        return {
+            "segment_index": segment_index / segment_count if segment_count != 0 else None,
+            "segment_count": segment_count,
+            "unknown_words": segment_unknown_words,
+            "complexity_index": total_index / total_count if total_count != 0 else None,
+            "word_count": total_count,
+            "final": final
+        }
+
+    for segment in _stream_segments(chunks, per_sentence):
+        words = prep_complexity_index_text(segment)
+        # Splitting the words at the window boundaries, so each window has exactly window_size words
+        while words:
+            if window_size:
+                window_words, words = words[:window_size -
+                                            segment_words], words[window_size - segment_words:]
+            else:
+                window_words, words = words, []
+            index, count, unknown_words = sum_word_complexities(
+                frequency_index, window_words)
+            total_index += index
+            total_count += count
+            segment_index += index
+            segment_count += count
+            segment_words += len(window_words)
+            segment_unknown_words.extend(unknown_words)
+            if window_size and segment_words >= window_size:
+                yield result(final=False)
+                segment_index, segment_count, segment_words, segment_unknown_words = 0, 0, 0, []
+        if per_sentence and not window_size and segment_words:
+            yield result(final=False)
+            segment_index, segment_count, segment_words, segment_unknown_words = 0, 0, 0, []
+    yield result(final=True)
+
+
+def _stream_segments(chunks: Iterable[str], per_sentence: bool) -> Iterator[str]:
+    """Joins the chunks of a text back into whole sentences, or whole words,
+    so no word is split across two chunks
+
+    Args:
+        chunks (Iterable[str]): The chunks of text
+        per_sentence (bool): If true, the text is split into sentences, otherwise at the last whitespace of each chunk
+
+    Yields:
+        Iterator[str]: The segments of text, in order
+    """
+    carry = ""
+    for chunk in chunks:
+        buffer = carry + chunk
+        if per_sentence:
+            *sentences, carry = SENTENCE_END.split(buffer)
+            yield from sentences
+            if len(carry) <= MAX_STREAM_SEGMENT_SIZE:
+                continue
+            buffer = carry
+        # Keeping the last (possibly partial) word for the next chunk
+        split_at = max(buffer.rfind(" "), buffer.rfind(
+            "\n"), buffer.rfind("\t"), buffer.rfind("\r"))
+        if split_at == -1 and len(buffer) <= MAX_STREAM_SEGMENT_SIZE:
+            carry = buffer
+            continue
+        split_at = split_at if split_at != -1 else len(buffer)
+        yield buffer[:split_at]
+        carry = buffer[split_at:]
+    if carry:
+        yield carry
+
+
+def get_unknown_words_complexities(frequency_index: WordFrequencyIndex, unknown_words: list[str],
+                                   use_spacy_pipeline: bool = False) -> tuple[float, int]:
+    """A similar function to the complexity index, but it first gets the wikipedia summaries
+        of each unknown word and then gets their complexity values
+
+    Args:
+        frequency_index (WordFrequencyIndex): The index of words to their complexity values
+        unknown_words (list[str]): The unknown words to first get the wikipedia summaries of
+        use_spacy_pipeline (bool, optional): If true, all of the summaries are lemmatized in a single
+            batched pass of the spaCy pipeline. Defaults to False.
+
+    Returns:
+        tuple[float, int]: The total of all the complexity values and the number of words/terms searched
+    """
+    summaries = get_wikipedia_summaries(unknown_words, content_type="text")
+    if use_spacy_pipeline:
+        cleaned_text, lemmas = prep_complexity_index_docs(summaries)
+    else:
+        cleaned_text, lemmas = prep_complexity_index_text(
+            " ".join(summaries)), None
+    index, count, _ = sum_word_complexities(
+        frequency_index, cleaned_text, lemmas)
     return index, count
 
 
+def save_lemma_table(word_to_word_lemmas: dict[str, str], path: str = LEMMA_TABLE_PATH) -> None:
+    """Saves the table of words to their lemmas as a binary LemmaTable, built once here so that
+    every process only has to map the file. Each save is written to a new file behind the path (see versioned_files.py),
+    so it can be saved while the app has the previous table mapped
+
+    Args:
+        word_to_word_lemmas (dict[str, str]): Dictionary mapping each word to its lemma
+        path (str, optional): The path of the table to write. Defaults to LEMMA_TABLE_PATH.
+    """
+    write_versioned_file(
+        path, [LemmaTable.from_dict(word_to_word_lemmas).to_bytes()])
+
+
+def load_lemma_table(path: str = LEMMA_TABLE_PATH, msgpack_path: str = LEMMA_TABLE_MSGPACK_PATH) -> LemmaTable:
+    """Opens the table of words to their lemmas saved by save_lemma_table with mmap, so every worker shares the same
+    pages instead of keeping its own dict of hundreds of thousands of strings
+
+    Args:
+        path (str, optional): The path of the binary lemma table. Defaults to LEMMA_TABLE_PATH.
+        msgpack_path (str, optional): The path of a table saved as msgpack before the binary format, which is built
+            in memory by each process until the binary table is saved. Defaults to LEMMA_TABLE_MSGPACK_PATH.
+
+    Returns:
+        LemmaTable: The table mapping each word to its lemma, empty if neither file exists
+    """
+    if os.path.exists(path):
+        return LemmaTable.from_binary(path)
+    if not os.path.exists(msgpack_path):
+        return LemmaTable.from_dict({})
+    with open(msgpack_path, "rb") as f:
+        return LemmaTable.from_dict(msgpack_decode(f.read(), type=dict[str, str]))
+
+
+word_lemmas = load_lemma_table()
+
+
 def get_lemma(word: str) -> Union[str, None]:
-    """Getting the lemma of the given word
+    """Getting the lemma of the given word, from the precomputed lemma table if possible,
+    otherwise from spaCy
+
+    Args:
+        word (str): Word to be lemmatized
+
+    Returns:
+        Union[str, None]: Lemmatized word or None if no lemma was found
+    """
+    try:
+        return word_lemmas[word]
+    except KeyError:
+        return get_spacy_lemma(word)
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def get_spacy_lemma(word: str) -> Union[str, None]:
+    """Getting the lemma of the given word by running it through the spaCy pipeline,
+    the results are kept in a bounded LRU cache
 
     Args:
         word (str): Word to be lemmatized
@@ -167,18 +482,50 @@ def prep_complexity_index_text(text: str) -> list[str]:
     Returns:
         list[str]: List of words to be passed to the complexity index calculator
     """
-    no_citations = re.sub("\[.\]", "", text)
-    # Remove unwanted characters
-    no_special_characters = re.sub(
-        ":|,|\.|\(|\)|\[|\]|\"|;", "", no_citations).strip()
-    # Split, lower, and remove stopwords
-    no_stopwords = [word.lower() for word in no_special_characters.split()
-                    if word not in eng_stopwords]
-    return no_stopwords
+    # Citations are the only part that needs a regex, so it is skipped for texts without brackets
+    if "[" in text:
+        text = CITATION.sub("", text)
+    # Remove unwanted characters, lower, split, and remove stopwords (after lowercasing, so capitalized stopwords are removed too)
+    return [word for word in text.translate(UNWANTED_CHARACTERS).lower().split()
+            if word not in eng_stopwords]
+
+
+def prep_complexity_index_docs(texts: list[str]) -> tuple[list[str], list[str]]:
+    """Runs the texts through the spaCy pipeline in a single batched pass, with the parser and
+    named entity recognizer disabled, and returns the lowercased words (minus punctuation, stopwords and split off clitics)
+    along with their lemmas
+
+    Args:
+        texts (list[str]): Texts to be tokenized and lemmatized
+
+    Returns:
+        tuple[list[str], list[str]]: List of words to be passed to the complexity index calculator, and the lemma of each word
+    """
+    words = []
+    lemmas = []
+    # Removing citations before tokenizing, so their numbers are not counted as words
+    no_citations = (CITATION.sub("", text) for text in texts)
+    for doc in nlp.pipe(no_citations, disable=SPACY_SCORING_DISABLED_PIPES):
+        for token in doc:
+            if token.is_punct or token.is_space:
+                continue
+            word = token.lower_
+            if word.startswith(SPACY_CLITIC_PREFIXES):
+                continue
+            lemma = token.lemma_.lower()
+            # The lemma is checked as well, for the words left by a split clitic ("ca" of "can't", "wo" of "won't")
+            if word in eng_stopwords or lemma in eng_stopwords:
+                continue
+            words.append(word)
+            lemmas.append(lemma)
+    return words, lemmas
 
 
 def get_wikipedia_summary(page_name: str, content_type: str = 'html') -> str:
-    """Gets the wikipedia summary for a term/word/page, if none is found it simply returns the term/word/page value
+    """Gets the wikipedia summary for a term/word/page, if none is found (or the request fails)
+    it simply returns the term/word/page value. If the offline summary store exists, it is the only source
+    of summaries and no requests are made. Otherwise summaries, and pages that were not found,
+    are kept in the persistent wikipedia_summary_cache
 
     Args:
         page_name (str): The page name to search for a summary of
@@ -187,12 +534,53 @@ def get_wikipedia_summary(page_name: str, content_type: str = 'html') -> str:
     Returns:
         str: The summary for the page_name, in html or text, or the page name itself
     """
-    response = requests.get(
-        f"https://en.wikipedia.org/api/rest_v1/page/summary/{page_name}")
+    offline_summaries = wikipedia_offline_summaries.get(
+    ) if wikipedia_offline_summaries is not None else None
+    if offline_summaries is not None:
+        summary = offline_summaries.get_summary(page_name, content_type)
+        return summary if summary is not None else page_name
+    cache = wikipedia_summary_cache
+    if cache is not None:
+        cached, summary = cache.get(page_name, content_type)
+        if cached:
+            return summary if summary is not None else page_name
+    try:
+        response = wikipedia_session.get(
+            f"{WIKIPEDIA_SUMMARY_ENDPOINT}{page_name}", timeout=WIKIPEDIA_REQUEST_TIMEOUT)
+    except requests.RequestException:
+        return page_name
     if response.status_code == 200:
+        summary = response.json()
+        if cache is not None:
+            # Both content types come in the same response, so both are cached
+            cache.set_many([(page_name, 'html', summary["extract_html"]),
+                            (page_name, 'text', summary["extract"])])
         if content_type == 'html':
-            return response.json()["extract_html"]
+            return summary["extract_html"]
         elif content_type == 'text':
-            return response.json()["extract"]
+            return summary["extract"]
     else:
+        # Only caching pages that do not exist, other errors may not happen the next time
+        if response.status_code == 404 and cache is not None:
+            cache.set_many([(page_name, 'html', None),
+                            (page_name, 'text', None)])
         return page_name
+
+
+def get_wikipedia_summaries(page_names: list[str], content_type: str = 'html') -> list[str]:
+    """Gets the wikipedia summaries of many terms/words/pages concurrently on the shared wikipedia_executor,
+    each distinct page is only requested once
+
+    Args:
+        page_names (list[str]): The page names to search for summaries of
+        content_type (str, optional): The content type to return (text or html). Defaults to 'html'.
+
+    Returns:
+        list[str]: The summary of each page name, in order, or the page name itself if none was found
+    """
+    unique_page_names = list(dict.fromkeys(page_names))
+    if not unique_page_names:
+        return []
+    summaries = dict(zip(unique_page_names, wikipedia_executor.map(
+        lambda page_name: get_wikipedia_summary(page_name, content_type), unique_page_names)))
+    return [summaries[page_name] for page_name in page_names]
@@ -0,0 +1,88 @@
+# Binary tables that are rebuilt while other processes have them memory-mapped
+#
+# Windows can not replace or delete a file while any process has a view of it mapped, so a rebuilt table can not be
+# moved over the one the app is using. Instead every build is written to a new file next to the table's path
+# (e.g. word_complexity_index.1700000000000000000.bin), and the table's path itself becomes a small pointer file holding
+# the name of the current build. The pointer is never mapped, so it can always be replaced, readers follow it to the
+# newest build, and older builds are deleted once no process has them mapped anymore.
+#
+# A table written directly at the path (before the pointer files) still opens, it is told apart by its magic bytes.
+# On Windows it is replaced by a pointer on the next build, which needs the processes mapping it to be stopped first
+
+import os
+import re
+import time
+from typing import Iterable
+
+# Times to try replacing the pointer file, on Windows a reader may have it open for a moment
+POINTER_REPLACE_ATTEMPTS = 5
+POINTER_REPLACE_DELAY = 0.1
+
+
+def write_versioned_file(path: str, chunks: Iterable[bytes]) -> str:
+    """Writes a new build of a table to its own file, then points the table's path at it
+
+    Args:
+        path (str): The path of the table (the pointer file), e.g. ./data/word_complexity_index.bin
+        chunks (Iterable[bytes]): The contents of the table
+
+    Returns:
+        str: The path of the file the build was written to
+    """
+    root, extension = os.path.splitext(path)
+    version_path = f"{root}.{time.time_ns()}{extension}"
+    # The pointer is only updated once the build is complete, so readers never see a partially written table
+    with open(version_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version_path))
+    for attempt in range(POINTER_REPLACE_ATTEMPTS):
+        try:
+            os.replace(temp_path, path)
+            break
+        except PermissionError:
+            if attempt == POINTER_REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(POINTER_REPLACE_DELAY)
+    remove_old_versions(path, version_path)
+    return version_path
+
+
+def resolve_versioned_file(path: str, magic: bytes) -> str:
+    """Gets the file of the current build of a table
+
+    Args:
+        path (str): The path of the table, either a pointer file or a table written directly at the path
+        magic (bytes): The bytes every build of the table starts with
+
+    Returns:
+        str: The path of the current build
+    """
+    with open(path, "rb") as f:
+        contents = f.read(len(magic))
+        if contents == magic:
+            return path
+        contents += f.read()
+    return os.path.join(os.path.dirname(path), contents.decode("utf-8").strip())
+
+
+def remove_old_versions(path: str, current_path: str) -> None:
+    """Deletes the builds of a table other than the current one. Builds still mapped by a process
+    can not be deleted on Windows, they are left for a later build to remove
+
+    Args:
+        path (str): The path of the table (the pointer file)
+        current_path (str): The path of the current build, which is kept
+    """
+    directory = os.path.dirname(path) or "."
+    root, extension = os.path.splitext(os.path.basename(path))
+    version_name = re.compile(
+        rf"{re.escape(root)}\.\d+{re.escape(extension)}")
+    for name in os.listdir(directory):
+        if version_name.fullmatch(name) and name != os.path.basename(current_path):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,259 @@
+# Compact, read-only vocabularies mapping words to dense integer ids, stored in a single byte buffer
+#
+# Vocabulary layout (little-endian):
+#   header:       number of words, number of hash slots, size of the words blob (unsigned 64 bit)
+#   word offsets: number of words + 1 unsigned 32 bit offsets into the words blob
+#   hash slots:   signed 32 bit word ids (-1 for empty slots), open addressing on the crc32 of the word
+#   words blob:   the words sorted by their utf-8 bytes, utf-8 encoded, so a word's id is its sorted position
+#
+# Lemma table layout (little-endian):
+#   header:       magic, number of words, number of words with a lemma (unsigned 64 bit)
+#   lemma ids:    number of words signed 32 bit lemma ids (-1 for words without a lemma), indexed by word id
+#   vocabulary:   the words and lemmas, as above
+
+import mmap
+import struct
+from zlib import crc32
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from versioned_files import resolve_versioned_file
+
+VOCABULARY_HEADER = struct.Struct("<QQQ")
+LEMMA_TABLE_MAGIC = b"LEMMA001"
+LEMMA_TABLE_HEADER = struct.Struct("<8sQQ")
+# The id of words that are not in the vocabulary
+UNKNOWN_WORD_ID = -1
+
+
+def serialize_vocabulary(words: Iterable[str]) -> tuple[bytes, np.ndarray]:
+    """Builds the byte buffer of a vocabulary from a list of distinct words
+
+    Args:
+        words (Iterable[str]): The distinct words of the vocabulary, in any order
+
+    Returns:
+        tuple[bytes, np.ndarray]: The buffer, and the id given to each of the input words (in input order)
+    """
+    encoded = [word.encode("utf-8") for word in words]
+    # Sorting by the utf-8 bytes, the order used by the lookups
+    order = sorted(range(len(encoded)), key=encoded.__getitem__)
+    ids = np.empty(len(encoded), dtype=np.int32)
+    ids[order] = np.arange(len(encoded), dtype=np.int32)
+    sorted_words = [encoded[position] for position in order]
+
+    offsets = np.zeros(len(sorted_words) + 1, dtype="<u4")
+    np.cumsum([len(word) for word in sorted_words], out=offsets[1:])
+    # A power of two at least twice the number of words, so probing stays short and the hash is a mask
+    slot_count = 1 << max(len(sorted_words) * 2 - 1, 0).bit_length()
+    mask = slot_count - 1
+    slots = np.full(slot_count, UNKNOWN_WORD_ID, dtype="<i4")
+    for word_id, word in enumerate(sorted_words):
+        slot = crc32(word) & mask
+        while slots[slot] != UNKNOWN_WORD_ID:
+            slot = (slot + 1) & mask
+        slots[slot] = word_id
+    words_blob = b"".join(sorted_words)
+    buffer = b"".join([VOCABULARY_HEADER.pack(len(sorted_words), slot_count, len(words_blob)),
+                       offsets.tobytes(), slots.tobytes(), words_blob])
+    return buffer, ids
+
+
+class Vocabulary:
+    """
+    A read-only mapping of words to dense int32 ids, kept in a single byte buffer (bytes or a memory map) instead of
+    a dict of Python strings, using a few bytes per word. Lookups hash the word into the slot table and compare
+    the candidate's bytes in place, and ids follow the sorted order of the words
+    """
+
+    def __init__(self, buffer: Union[bytes, memoryview], offset: int = 0):
+        word_count, slot_count, words_size = VOCABULARY_HEADER.unpack_from(
+            buffer, offset)
+        view = memoryview(buffer)
+        offsets_start = offset + VOCABULARY_HEADER.size
+        slots_start = offsets_start + 4 * (word_count + 1)
+        self._words_start = slots_start + 4 * slot_count
+        self._buffer = buffer
+        self._count = word_count
+        self._mask = slot_count - 1
+        # memoryviews are used for single lookups, since indexing them gives plain ints
+        self._offsets = view[offsets_start:slots_start].cast("I")
+        self._slots = view[slots_start:self._words_start].cast("i")
+        self._offset = offset
+        self.nbytes = self._words_start + words_size - offset
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> tuple["Vocabulary", np.ndarray]:
+        """Builds a vocabulary in memory from a list of distinct words
+
+        Args:
+            words (Iterable[str]): The distinct words of the vocabulary, in any order
+
+        Returns:
+            tuple[Vocabulary, np.ndarray]: The vocabulary, and the id given to each of the input words (in input order)
+        """
+        buffer, ids = serialize_vocabulary(words)
+        return cls(buffer), ids
+
+    def to_bytes(self) -> bytes:
+        """Gets the buffer of the vocabulary, to be written into a file and opened again with Vocabulary(buffer, offset)
+
+        Returns:
+            bytes: The header, offsets, hash slots and words of the vocabulary
+        """
+        return bytes(self._buffer[self._offset:self._offset + self.nbytes])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, word: str) -> bool:
+        return self.get(word, UNKNOWN_WORD_ID) != UNKNOWN_WORD_ID
+
+    def __getitem__(self, word: str) -> int:
+        word_id = self.get(word, UNKNOWN_WORD_ID)
+        if word_id == UNKNOWN_WORD_ID:
+            raise KeyError(word)
+        return word_id
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.word(word_id) for word_id in range(self._count))
+
+    def get(self, word: str, default: Union[int, None] = None) -> Union[int, None]:
+        """Gets the id of a word
+
+        Args:
+            word (str): The word to get the id of
+            default (Union[int, None], optional): The value returned for unknown words. Defaults to None.
+
+        Returns:
+            Union[int, None]: The id of the word, or the default if the word is not in the vocabulary
+        """
+        key = word.encode("utf-8")
+        buffer, offsets, slots, start, mask = self._buffer, self._offsets, self._slots, self._words_start, self._mask
+        slot = crc32(key) & mask
+        word_id = slots[slot]
+        while word_id != UNKNOWN_WORD_ID:
+            if buffer[start + offsets[word_id]:start + offsets[word_id + 1]] == key:
+                return word_id
+            slot = (slot + 1) & mask
+            word_id = slots[slot]
+        return default
+
+    def word(self, word_id: int) -> str:
+        """Gets the word with the given id
+
+        Args:
+            word_id (int): The id of the word
+
+        Returns:
+            str: The word
+        """
+        start = self._words_start
+        return bytes(self._buffer[start + self._offsets[word_id]:start + self._offsets[word_id + 1]]).decode("utf-8")
+
+    def lookup_ids(self, tokens: Iterable[str]) -> np.ndarray:
+        """Gets the ids of many words at once
+
+        Args:
+            tokens (Iterable[str]): The words to get the ids of
+
+        Returns:
+            np.ndarray: The id of each word, in order, with UNKNOWN_WORD_ID for unknown words
+        """
+        get = self.get
+        return np.fromiter((get(token, UNKNOWN_WORD_ID) for token in tokens), dtype=np.int32)
+
+
+class LemmaTable:
+    """
+    A read-only table of words to their lemmas. The words and lemmas share a single Vocabulary,
+    and each word's lemma is stored as the int32 id of the lemma
+    """
+
+    def __init__(self, vocabulary: Vocabulary, lemma_ids: np.ndarray, count: Union[int, None] = None):
+        self.vocabulary = vocabulary
+        # Plain ints are faster to index one at a time than a NumPy array
+        self._lemma_ids = memoryview(
+            np.ascontiguousarray(lemma_ids, dtype=np.int32)).cast("B").cast("i")
+        self._count = int(np.count_nonzero(
+            np.asarray(lemma_ids) != UNKNOWN_WORD_ID)) if count is None else count
+
+    @classmethod
+    def from_dict(cls, word_to_word_lemmas: dict[str, str]) -> "LemmaTable":
+        """Builds the table from a dictionary of words to their lemmas
+
+        Args:
+            word_to_word_lemmas (dict[str, str]): Dictionary mapping each word to its lemma
+
+        Returns:
+            LemmaTable: The table of words to their lemmas
+        """
+        words = list(set(word_to_word_lemmas) | set(word_to_word_lemmas.values()))
+        vocabulary, ids = Vocabulary.from_words(words)
+        word_ids = dict(zip(words, ids.tolist()))
+        # Lemmas that are only lemmas (not words of the table themselves) have no lemma
+        lemma_ids = np.full(len(vocabulary), UNKNOWN_WORD_ID, dtype=np.int32)
+        for word, word_lemma in word_to_word_lemmas.items():
+            lemma_ids[word_ids[word]] = word_ids[word_lemma]
+        return cls(vocabulary, lemma_ids, len(word_to_word_lemmas))
+
+    @classmethod
+    def from_binary(cls, path: str) -> "LemmaTable":
+        """Opens the binary table written with to_bytes (see utils.save_lemma_table) with mmap, so every process
+        shares the same physical pages and opening is near-instant
+
+        Args:
+            path (str): The path to the binary file, or its pointer file, e.g. ./data/word_lemmas.bin
+
+        Returns:
+            LemmaTable: The table of words to their lemmas
+        """
+        path = resolve_versioned_file(path, LEMMA_TABLE_MAGIC)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, word_count, count = LEMMA_TABLE_HEADER.unpack_from(mapped, 0)
+        if magic != LEMMA_TABLE_MAGIC:
+            raise ValueError(f"{path} is not a binary lemma table")
+        lemma_ids = np.frombuffer(
+            mapped, dtype="<i4", count=word_count, offset=LEMMA_TABLE_HEADER.size)
+        vocabulary = Vocabulary(
+            mapped, LEMMA_TABLE_HEADER.size + 4 * word_count)
+        return cls(vocabulary, lemma_ids, count)
+
+    def to_bytes(self) -> bytes:
+        """Gets the binary table, to be written into a file and opened with LemmaTable.from_binary
+
+        Returns:
+            bytes: The header, lemma ids and vocabulary of the table
+        """
+        return b"".join([LEMMA_TABLE_HEADER.pack(LEMMA_TABLE_MAGIC, len(self.vocabulary), self._count),
+                         self._lemma_ids.tobytes(), self.vocabulary.to_bytes()])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+
+    def __getitem__(self, word: str) -> str:
+        word_lemma = self.get(word)
+        if word_lemma is None:
+            raise KeyError(word)
+        return word_lemma
+
+    def get(self, word: str, default: Union[str, None] = None) -> Union[str, None]:
+        """Gets the lemma of a word
+
+        Args:
+            word (str): The word to get the lemma of
+            default (Union[str, None], optional): The value returned for words not in the table. Defaults to None.
+
+        Returns:
+            Union[str, None]: The lemma of the word, or the default if the word is not in the table
+        """
+        word_id = self.vocabulary.get(word, UNKNOWN_WORD_ID)
+        if word_id == UNKNOWN_WORD_ID:
+            return default
+        lemma_id = self._lemma_ids[word_id]
+        return default if lemma_id == UNKNOWN_WORD_ID else self.vocabulary.word(lemma_id)
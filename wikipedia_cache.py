@@ -0,0 +1,125 @@
+# Persistent cache of Wikipedia summaries, shared by every app worker through a single SQLite file
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Union
+
+# Default location of the cache database
+WIKIPEDIA_CACHE_PATH = "./data/wikipedia_summary_cache.sqlite3"
+# Seconds a found summary is kept before it is fetched again
+WIKIPEDIA_CACHE_TTL = 30 * 24 * 60 * 60
+# Seconds a page that was not found (404) is remembered as missing
+WIKIPEDIA_CACHE_NEGATIVE_TTL = 24 * 60 * 60
+# Max number of entries kept, the oldest entries are removed first
+WIKIPEDIA_CACHE_MAX_ENTRIES = 100_000
+# Number of writes (per process) between each pruning of expired and excess entries
+PRUNE_INTERVAL = 500
+
+
+class WikipediaSummaryCache:
+    """
+    A persistent cache of Wikipedia summaries keyed by page name and content type, stored in SQLite so that
+    every app worker shares it. Pages that were not found are stored as negative entries (a summary of None)
+    """
+
+    def __init__(self, path: str = WIKIPEDIA_CACHE_PATH, ttl: float = WIKIPEDIA_CACHE_TTL,
+                 negative_ttl: float = WIKIPEDIA_CACHE_NEGATIVE_TTL, max_entries: int = WIKIPEDIA_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # SQLite connections can not be shared between threads, so each thread opens its own
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            # Write-ahead logging lets the workers read while another worker is writing
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "page_name TEXT NOT NULL, content_type TEXT NOT NULL, summary TEXT, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (page_name, content_type))")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS summaries_fetched_at ON summaries (fetched_at)")
+            connection.commit()
+            self._local.connection = connection
+        return connection
+
+    def get(self, page_name: str, content_type: str) -> tuple[bool, Union[str, None]]:
+        """Gets a summary from the cache
+
+        Args:
+            page_name (str): The page name of the summary
+            content_type (str): The content type of the summary (text or html)
+
+        Returns:
+            tuple[bool, Union[str, None]]: Whether there was a fresh entry in the cache, and the summary,
+            which is None for pages known to be missing
+        """
+        row = self._connection().execute(
+            "SELECT summary, fetched_at FROM summaries WHERE page_name = ? AND content_type = ?",
+            (page_name, content_type)).fetchone()
+        if row is None:
+            return False, None
+        summary, fetched_at = row
+        ttl = self.ttl if summary is not None else self.negative_ttl
+        if time.time() - fetched_at > ttl:
+            return False, None
+        return True, summary
+
+    def set(self, page_name: str, content_type: str, summary: Union[str, None]) -> None:
+        """Stores a summary in the cache
+
+        Args:
+            page_name (str): The page name of the summary
+            content_type (str): The content type of the summary (text or html)
+            summary (Union[str, None]): The summary, or None if the page does not exist
+        """
+        self.set_many([(page_name, content_type, summary)])
+
+    def set_many(self, entries: list[tuple[str, str, Union[str, None]]]) -> None:
+        """Stores many summaries in the cache in a single transaction
+
+        Args:
+            entries (list[tuple[str, str, Union[str, None]]]): The page name, content type and summary of each entry
+        """
+        connection = self._connection()
+        fetched_at = time.time()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO summaries (page_name, content_type, summary, fetched_at) VALUES (?, ?, ?, ?)",
+                [(page_name, content_type, summary, fetched_at) for page_name, content_type, summary in entries])
+        self._writes += len(entries)
+        if self._writes >= PRUNE_INTERVAL:
+            self._writes = 0
+            self.prune()
+
+    def prune(self) -> None:
+        """Removes the expired entries, then the oldest entries until there are at most max_entries left"""
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute(
+                "DELETE FROM summaries WHERE (summary IS NOT NULL AND fetched_at < ?) OR (summary IS NULL AND fetched_at < ?)",
+                (now - self.ttl, now - self.negative_ttl))
+            excess = connection.execute(
+                "SELECT COUNT(*) FROM summaries").fetchone()[0] - self.max_entries
+            if excess > 0:
+                connection.execute(
+                    "DELETE FROM summaries WHERE rowid IN (SELECT rowid FROM summaries ORDER BY fetched_at ASC LIMIT ?)",
+                    (excess,))
+
+    def clear(self) -> None:
+        """Removes every entry from the cache"""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM summaries")
@@ -0,0 +1,282 @@
+# Offline Wikipedia summaries, read from a memory-mapped store built from a local abstracts dump
+#
+# Building the store:
+#   python wikipedia_offline.py enwiki-latest-abstract.xml.gz -o ./data/wikipedia_summaries.idx
+#   python wikipedia_offline.py summaries.jsonl -o ./data/wikipedia_summaries.idx
+#
+# Store layout (all integers are little-endian unsigned 64 bit):
+#   header:        magic, number of entries, start of the keys blob, start of the values blob
+#   key offsets:   number of entries + 1 offsets into the keys blob, the keys are sorted by their utf-8 bytes
+#   value offsets: number of entries + 1 offsets into the values blob, in the same order as the keys
+#   keys blob:     the normalized page names, utf-8 encoded
+#   values blob:   the plain text summaries, utf-8 encoded
+#
+# The store's path is a pointer to its current build, so it can be rebuilt while the app has it mapped (see
+# versioned_files.py), and the app's OfflineSummariesLoader opens the new build on its next lookup
+
+import os
+import gzip
+import json
+import mmap
+import struct
+import argparse
+import tempfile
+from html import escape
+from array import array
+from threading import Lock
+from typing import Iterator, Union
+from xml.etree.ElementTree import iterparse
+
+from versioned_files import write_versioned_file, resolve_versioned_file
+
+# Default location of the offline summary store
+WIKIPEDIA_OFFLINE_INDEX_PATH = "./data/wikipedia_summaries.idx"
+
+MAGIC = b"WKSUMM01"
+HEADER = struct.Struct("<8sQQQ")
+# Prefix of the titles in the Wikipedia abstracts dump
+ABSTRACT_TITLE_PREFIX = "Wikipedia: "
+
+
+def normalize_page_name(page_name: str) -> str:
+    """Normalizes a page name so that lookups do not depend on case or underscores
+
+    Args:
+        page_name (str): The page name or title
+
+    Returns:
+        str: The lowercased page name, with underscores replaced by spaces
+    """
+    return " ".join(page_name.replace("_", " ").split()).lower()
+
+
+def iter_dump_summaries(dump_path: str) -> Iterator[tuple[str, str]]:
+    """Reads the titles and summaries of a local Wikipedia dump, either the XML abstracts dump
+    (optionally gzipped) or a JSONL file of records with a title and an extract
+
+    Args:
+        dump_path (str): The path to the dump
+
+    Yields:
+        Iterator[tuple[str, str]]: The title and plain text summary of each page
+    """
+    opener = gzip.open if dump_path.endswith(".gz") else open
+    if ".jsonl" in dump_path:
+        with opener(dump_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["title"], record["extract"]
+        return
+    with opener(dump_path, "rb") as f:
+        title = None
+        root = None
+        for event, element in iterparse(f, events=("start", "end")):
+            if event == "start":
+                # The <feed> element, every finished page is removed from it
+                if root is None:
+                    root = element
+                continue
+            if element.tag == "title":
+                title = (element.text or "").removeprefix(
+                    ABSTRACT_TITLE_PREFIX)
+            elif element.tag == "abstract":
+                abstract = (element.text or "").strip()
+                if title and abstract:
+                    yield title, abstract
+            elif element.tag == "doc":
+                # Removing each finished page from the root, so the parsed tree does not grow with the dump
+                root.clear()
+
+
+def build_offline_index(dump_path: str, output_path: str = WIKIPEDIA_OFFLINE_INDEX_PATH) -> int:
+    """Builds the memory-mapped summary store from a local Wikipedia dump. The summaries are streamed to a
+    temporary file as they are read, only the page names are kept in memory for sorting. Each build is written
+    to a new file and output_path is pointed at it, so processes that have the old build mapped are unaffected
+
+    Args:
+        dump_path (str): The path to the dump
+        output_path (str, optional): The path of the store to write. Defaults to WIKIPEDIA_OFFLINE_INDEX_PATH.
+
+    Returns:
+        int: The number of summaries in the store
+    """
+    output_directory = os.path.dirname(output_path) or "."
+    os.makedirs(output_directory, exist_ok=True)
+    seen = set()
+    # Each entry is the encoded page name, and the position and length of its summary in the values file
+    entries = []
+    with tempfile.TemporaryFile(dir=output_directory) as values_file:
+        position = 0
+        for title, summary in iter_dump_summaries(dump_path):
+            key = normalize_page_name(title).encode("utf-8")
+            # Keeping the first page of any duplicated (normalized) name
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            value = summary.encode("utf-8")
+            values_file.write(value)
+            entries.append((key, position, len(value)))
+            position += len(value)
+        seen.clear()
+        entries.sort(key=lambda entry: entry[0])
+
+        key_offsets = array("Q", [0])
+        value_offsets = array("Q", [0])
+        for key, _, length in entries:
+            key_offsets.append(key_offsets[-1] + len(key))
+            value_offsets.append(value_offsets[-1] + length)
+        keys_start = HEADER.size + 16 * (len(entries) + 1)
+        values_start = keys_start + key_offsets[-1]
+
+        def store_chunks() -> Iterator[bytes]:
+            yield HEADER.pack(MAGIC, len(entries), keys_start, values_start)
+            yield key_offsets.tobytes()
+            yield value_offsets.tobytes()
+            for key, _, _ in entries:
+                yield key
+            # Copying the summaries over in sorted order
+            for _, value_position, length in entries:
+                values_file.seek(value_position)
+                yield values_file.read(length)
+
+        write_versioned_file(output_path, store_chunks())
+    return len(entries)
+
+
+class OfflineWikipediaSummaries:
+    """
+    Read-only lookups of Wikipedia summaries from a store built by build_offline_index. The store is memory-mapped,
+    so lookups are a binary search over the sorted page names at local disk latency, and every worker shares the pages
+    """
+
+    def __init__(self, path: str = WIKIPEDIA_OFFLINE_INDEX_PATH):
+        self.path = path
+        with open(resolve_versioned_file(path, MAGIC), "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._keys_start, self._values_start = HEADER.unpack_from(
+            self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(
+                f"{path} is not an offline Wikipedia summary store")
+        offsets_size = 8 * (self._count + 1)
+        self._buffer = buffer = memoryview(self._mmap)
+        self._key_offsets = buffer[HEADER.size:HEADER.size +
+                                   offsets_size].cast("Q")
+        self._value_offsets = buffer[HEADER.size + offsets_size:HEADER.size +
+                                     2 * offsets_size].cast("Q")
+
+    @classmethod
+    def open_if_exists(cls, path: str = WIKIPEDIA_OFFLINE_INDEX_PATH) -> Union["OfflineWikipediaSummaries", None]:
+        """Opens the store if it has been built
+
+        Args:
+            path (str, optional): The path of the store. Defaults to WIKIPEDIA_OFFLINE_INDEX_PATH.
+
+        Returns:
+            Union[OfflineWikipediaSummaries, None]: The store, or None if there is no store at the path
+        """
+        return cls(path) if os.path.exists(path) else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, position: int) -> bytes:
+        start = self._keys_start + self._key_offsets[position]
+        end = self._keys_start + self._key_offsets[position + 1]
+        return self._mmap[start:end]
+
+    def get(self, page_name: str) -> Union[str, None]:
+        """Gets the plain text summary of a page
+
+        Args:
+            page_name (str): The page name to get the summary of
+
+        Returns:
+            Union[str, None]: The summary, or None if the page is not in the store
+        """
+        key = normalize_page_name(page_name).encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._count or self._key(low) != key:
+            return None
+        start = self._values_start + self._value_offsets[low]
+        end = self._values_start + self._value_offsets[low + 1]
+        return self._mmap[start:end].decode("utf-8")
+
+    def get_summary(self, page_name: str, content_type: str = 'html') -> Union[str, None]:
+        """Gets the summary of a page in the same content types as the Wikipedia REST API
+
+        Args:
+            page_name (str): The page name to get the summary of
+            content_type (str, optional): The content type to return (text or html). Defaults to 'html'.
+
+        Returns:
+            Union[str, None]: The summary in html or text, or None if the page is not in the store
+        """
+        summary = self.get(page_name)
+        if summary is None:
+            return None
+        return f"<p>{escape(summary)}</p>" if content_type == 'html' else summary
+
+    def close(self):
+        '''Release the memory map of the store'''
+        self._key_offsets.release()
+        self._value_offsets.release()
+        self._buffer.release()
+        self._mmap.close()
+
+
+class OfflineSummariesLoader:
+    """
+    Opens the offline summary store once per process and shares it with every lookup, reopening it only when
+    the modification time of its path (the pointer file, replaced by every build) changes
+    """
+
+    def __init__(self, path: str = WIKIPEDIA_OFFLINE_INDEX_PATH):
+        self.path = path
+        self._lock = Lock()
+        # The modification time and store are stored together, so swapping them is a single assignment
+        self._loaded: Union[tuple[int, OfflineWikipediaSummaries], None] = None
+
+    def get(self) -> Union[OfflineWikipediaSummaries, None]:
+        """Gets the current store, opening the newest build first if the store has been rebuilt
+
+        Returns:
+            Union[OfflineWikipediaSummaries, None]: The store, or None if it has not been built
+        """
+        loaded = self._loaded
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return loaded[1] if loaded is not None else None
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+        with self._lock:
+            # Another thread may have already opened the store while waiting for the lock
+            loaded = self._loaded
+            if loaded is None or loaded[0] != mtime:
+                try:
+                    loaded = (mtime, OfflineWikipediaSummaries(self.path))
+                except OSError:
+                    # A build that was replaced (and removed) just after the pointer was read, the next call retries
+                    return loaded[1] if loaded is not None else None
+                # The previous store is not closed, lookups in other threads may still be using it
+                self._loaded = loaded
+            return loaded[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the offline Wikipedia summary store from a local abstracts dump")
+    parser.add_argument(
+        "dump", help="The XML abstracts dump (.xml or .xml.gz) or a JSONL file of title/extract records")
+    parser.add_argument("-o", "--output", default=WIKIPEDIA_OFFLINE_INDEX_PATH,
+                        help="Path of the store to write")
+    args = parser.parse_args()
+    print(f"Wrote {build_offline_index(args.dump, args.output)} summaries to {args.output}")
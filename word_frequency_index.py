@@ -0,0 +1,357 @@
+# Hash-indexed lookups of the word complexity values used by the complexity index
+#
+# Converting the csv table to the binary, memory-mapped format:
+#   python word_frequency_index.py ./data/word_complexity_index.csv ./data/word_complexity_index.bin
+#
+# The binary path is a pointer to the current build of the table, so it can be rebuilt while the app has it mapped,
+# see versioned_files.py
+#
+# Binary layout (little-endian):
+#   header:       magic, number of words, number of metrics (unsigned 64 bit)
+#   metric names: a 32 byte, null padded ascii name per metric, the first is always frequency
+#   metrics:      number of words float32 complexity values per metric, indexed by word id
+#   vocabulary:   the words and their hash slots, see vocabulary.py
+
+import os
+import copy
+import mmap
+import struct
+import argparse
+from itertools import count
+from threading import Lock
+from typing import Iterable, Union
+
+import numpy as np
+from pandas import DataFrame, read_csv, to_numeric
+
+from vocabulary import Vocabulary, UNKNOWN_WORD_ID
+from versioned_files import write_versioned_file, resolve_versioned_file
+
+# Default location of the table of words and their complexity values
+WORD_COMPLEXITY_INDEX_PATH = "./data/word_complexity_index.csv"
+# Default location of the binary, memory-mapped version of the table, used instead of the csv when it exists
+WORD_COMPLEXITY_INDEX_BINARY_PATH = "./data/word_complexity_index.bin"
+BINARY_MAGIC = b"WCIDX003"
+BINARY_HEADER = struct.Struct("<8sQQ")
+BINARY_METRIC_NAME = struct.Struct("32s")
+# The metric used by default, the inverse of the number of times the word appears in definitions.
+# Other metrics (e.g. pagerank, in_degree and depth from graph_metrics.py) are extra columns of the table
+DEFAULT_METRIC = "frequency"
+# Each index built in this process gets the next version, so caches can tell when the table was reloaded
+_index_versions = count(1)
+
+
+class WordFrequencyIndex:
+    """
+    A read-only index of words and their complexity values (the inverse of the number of times the word
+    appears in dictionary definitions), built once from the word complexity index csv for constant time lookups,
+    or opened from the memory-mapped binary table. Each word is given an integer id by a compact Vocabulary
+    into a NumPy array of the values, for vectorized lookups of many words.
+    Every other numeric column of the table is an alternative metric, selected with with_metric
+    """
+
+    def __init__(self, vocabulary: Vocabulary, frequencies: np.ndarray,
+                 metrics: Union[dict[str, np.ndarray], None] = None):
+        self.vocabulary = vocabulary
+        self.metrics = {}
+        for name, values in {DEFAULT_METRIC: frequencies, **(metrics or {})}.items():
+            # float32 values from the binary table are kept as they are, so the memory-mapped array is not copied
+            values = np.asarray(values)
+            if values.dtype.kind != "f":
+                values = values.astype(np.float64)
+            # Shared by every callback, so the values must never be changed in place
+            values.setflags(write=False)
+            self.metrics[name] = values
+        self.metric = DEFAULT_METRIC
+        self.frequencies = self.metrics[DEFAULT_METRIC]
+        self.version = next(_index_versions)
+        # The index of each metric, shared by all of them so each is only created once
+        self._metric_indexes = {DEFAULT_METRIC: self}
+
+    def with_metric(self, metric: str) -> "WordFrequencyIndex":
+        """Gets the index using another metric as the complexity value of each word. It shares the vocabulary
+        and version of this index, so every function taking a WordFrequencyIndex can score with any metric
+
+        Args:
+            metric (str): The name of the metric, e.g. frequency, pagerank, in_degree or depth
+
+        Raises:
+            KeyError: If the table has no values for the metric
+
+        Returns:
+            WordFrequencyIndex: The index of each word to its value for the metric
+        """
+        metric_index = self._metric_indexes.get(metric)
+        if metric_index is None:
+            if metric not in self.metrics:
+                raise KeyError(
+                    f"The word complexity index has no {metric} values")
+            metric_index = copy.copy(self)
+            metric_index.metric = metric
+            metric_index.frequencies = self.metrics[metric]
+            self._metric_indexes[metric] = metric_index
+        return metric_index
+
+    @classmethod
+    def from_dataframe(cls, df: DataFrame) -> "WordFrequencyIndex":
+        """Builds the index from a DataFrame with a word column, a frequency column and any other metric columns
+
+        Args:
+            df (DataFrame): The dataframe containing the words and their complexity values
+
+        Returns:
+            WordFrequencyIndex: The index of each word to its complexity value
+        """
+        # Keeping the first value of any duplicated word, and dropping empty words
+        unique_words = df.dropna(subset=["word"]).drop_duplicates(
+            subset="word", keep="first")
+        vocabulary, word_ids = Vocabulary.from_words(
+            unique_words.word.astype(str).tolist())
+        metrics = {}
+        for column in unique_words.columns:
+            # Skipping the words and any index column written along with the table
+            if column == "word" or str(column).startswith("Unnamed"):
+                continue
+            # Reordering the values by word id
+            values = np.empty(len(vocabulary), dtype=np.float64)
+            values[word_ids] = to_numeric(
+                unique_words[column], errors="coerce").to_numpy(dtype=np.float64)
+            metrics[column] = values
+        return cls(vocabulary, metrics.pop(DEFAULT_METRIC), metrics)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "WordFrequencyIndex":
+        """Reads the word complexity index csv file and builds the index from it
+
+        Args:
+            path (str): The path to the csv file, e.g. ./data/word_complexity_index.csv
+
+        Returns:
+            WordFrequencyIndex: The index of each word to its complexity value
+        """
+        # keep_default_na is off so that real words like "nan" and "null" are not read as missing values
+        return cls.from_dataframe(read_csv(path, keep_default_na=False))
+
+    @classmethod
+    def from_binary(cls, path: str) -> "WordFrequencyIndex":
+        """Opens the binary table written by write_binary_index with mmap, so every process shares the same
+        physical pages and opening is near-instant
+
+        Args:
+            path (str): The path to the binary file, or its pointer file, e.g. ./data/word_complexity_index.bin
+
+        Returns:
+            WordFrequencyIndex: The index of each word to its complexity value
+        """
+        path = resolve_versioned_file(path, BINARY_MAGIC)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, word_count, metric_count = BINARY_HEADER.unpack_from(mapped, 0)
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary word complexity index")
+        position = BINARY_HEADER.size
+        names = []
+        for _ in range(metric_count):
+            names.append(BINARY_METRIC_NAME.unpack_from(
+                mapped, position)[0].rstrip(b"\0").decode("ascii"))
+            position += BINARY_METRIC_NAME.size
+        metrics = {}
+        for name in names:
+            metrics[name] = np.frombuffer(
+                mapped, dtype="<f4", count=word_count, offset=position)
+            position += 4 * word_count
+        return cls(Vocabulary(mapped, position), metrics.pop(DEFAULT_METRIC), metrics)
+
+    @classmethod
+    def from_path(cls, path: str) -> "WordFrequencyIndex":
+        """Loads the index from either the binary table (.bin) or the csv table
+
+        Args:
+            path (str): The path to the binary or csv file
+
+        Returns:
+            WordFrequencyIndex: The index of each word to its complexity value
+        """
+        return cls.from_binary(path) if path.endswith(".bin") else cls.from_csv(path)
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.vocabulary
+
+    def __getitem__(self, word: str) -> float:
+        return float(self.frequencies[self.vocabulary[word]])
+
+    def get(self, word: str, default: Union[float, None] = None) -> Union[float, None]:
+        """Gets the complexity value of a word
+
+        Args:
+            word (str): The word to get the complexity value of
+            default (Union[float, None], optional): The value returned for unknown words. Defaults to None.
+
+        Returns:
+            Union[float, None]: The complexity value of the word, or the default if the word is not in the index
+        """
+        word_id = self.vocabulary.get(word)
+        return default if word_id is None else float(self.frequencies[word_id])
+
+    def word_id(self, word: str) -> int:
+        """Gets the integer id of a word, its position in the frequencies array
+
+        Args:
+            word (str): The word to get the id of
+
+        Returns:
+            int: The id of the word, or UNKNOWN_WORD_ID if the word is not in the index
+        """
+        return self.vocabulary.get(word, UNKNOWN_WORD_ID)
+
+    def lookup_ids(self, tokens: Iterable[str]) -> np.ndarray:
+        """Gets the integer ids of many words at once
+
+        Args:
+            tokens (Iterable[str]): The words to get the ids of
+
+        Returns:
+            np.ndarray: The id of each word, in order, with UNKNOWN_WORD_ID for unknown words
+        """
+        return self.vocabulary.lookup_ids(tokens)
+
+    def lookup_many(self, tokens: Iterable[str]) -> list[Union[float, None]]:
+        """Gets the complexity values of many words at once
+
+        Args:
+            tokens (Iterable[str]): The words to get the complexity values of
+
+        Returns:
+            list[Union[float, None]]: The complexity value of each word, in order, with None for unknown words
+        """
+        word_ids = self.lookup_ids(tokens)
+        if not len(self):
+            return [None] * len(word_ids)
+        # Unknown ids gather the last value, which is then replaced with None
+        values = self.frequencies.take(word_ids).tolist()
+        return [None if word_id == UNKNOWN_WORD_ID else value
+                for word_id, value in zip(word_ids.tolist(), values)]
+
+
+def write_binary_index(csv_path: str, binary_path: str = WORD_COMPLEXITY_INDEX_BINARY_PATH) -> int:
+    """Converts the word complexity index csv (with all of its metrics) into the binary format opened by
+    WordFrequencyIndex.from_binary. Each build is written to a new file and binary_path is pointed at it,
+    so processes that have the old build mapped are unaffected (and the build works on Windows, where a mapped
+    file can not be replaced)
+
+    Args:
+        csv_path (str): The path to the csv file
+        binary_path (str, optional): The path of the binary file to write. Defaults to WORD_COMPLEXITY_INDEX_BINARY_PATH.
+
+    Returns:
+        int: The number of words written
+    """
+    frequency_index = WordFrequencyIndex.from_csv(csv_path)
+    header = BINARY_HEADER.pack(BINARY_MAGIC, len(
+        frequency_index), len(frequency_index.metrics))
+    names = [BINARY_METRIC_NAME.pack(name.encode("ascii"))
+             for name in frequency_index.metrics]
+    metrics = [values.astype("<f4").tobytes()
+               for values in frequency_index.metrics.values()]
+    write_versioned_file(binary_path, [header, *names, *metrics,
+                                       frequency_index.vocabulary.to_bytes()])
+    return len(frequency_index)
+
+
+def existing_binary_path(csv_path: str) -> Union[str, None]:
+    """Gets the binary table built from a csv table (the .bin file next to it), so that rebuilding the csv
+    also rewrites the binary table that the app and score_corpus.py read instead of the csv
+
+    Args:
+        csv_path (str): The path to the csv file
+
+    Returns:
+        Union[str, None]: The path of the binary table, or None if it has not been built
+    """
+    binary_path = f"{os.path.splitext(csv_path)[0]}.bin"
+    return binary_path if os.path.exists(binary_path) else None
+
+
+def default_index_path() -> str:
+    """Gets the path of the table to load, the binary table if it has been built, otherwise the csv
+
+    Returns:
+        str: The path of the binary or csv table
+    """
+    return WORD_COMPLEXITY_INDEX_BINARY_PATH if os.path.exists(WORD_COMPLEXITY_INDEX_BINARY_PATH) else WORD_COMPLEXITY_INDEX_PATH
+
+
+class FrequencyIndexLoader:
+    """
+    Loads the word complexity index table (binary or csv) once per process and shares the same read-only WordFrequencyIndex
+    with every caller, reloading it only when the file's modification time changes (for the binary table, the pointer
+    file's, which is replaced by every build)
+    """
+
+    def __init__(self, path: Union[str, None] = None):
+        # Without a path the table is picked again on every call until one has loaded, so a table built after the app
+        # started is found (the binary table if it was built too)
+        self._default_path = path is None
+        self.path = path or default_index_path()
+        self._lock = Lock()
+        # The modification time and index are stored together, so swapping them is a single assignment
+        self._loaded: Union[tuple[int, WordFrequencyIndex], None] = None
+
+    def get(self) -> WordFrequencyIndex:
+        """Gets the current index, reloading the table first if it has changed since it was last read
+
+        Returns:
+            WordFrequencyIndex: The index of each word to its complexity value
+        """
+        loaded = self._loaded
+        if loaded is None and self._default_path:
+            self.path = default_index_path()
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            # Keep serving the last index if the file is briefly missing while being replaced
+            if loaded is not None:
+                return loaded[1]
+            raise
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+        with self._lock:
+            # Another thread may have already reloaded the file while waiting for the lock
+            loaded = self._loaded
+            if loaded is None or loaded[0] != mtime:
+                try:
+                    loaded = (mtime, WordFrequencyIndex.from_path(self.path))
+                except OSError:
+                    # A build that was replaced (and removed) just after the pointer was read, the next call retries
+                    if loaded is not None:
+                        return loaded[1]
+                    raise
+                self._loaded = loaded
+            return loaded[1]
+
+
+# Process-wide loader shared by all of the callbacks
+frequency_index_loader = FrequencyIndexLoader()
+
+
+def get_frequency_index() -> WordFrequencyIndex:
+    """Gets the process-wide word complexity index, loading or reloading it from disk if needed
+
+    Returns:
+        WordFrequencyIndex: The index of each word to its complexity value
+    """
+    return frequency_index_loader.get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the word complexity index csv into the binary, memory-mapped format")
+    parser.add_argument("csv", nargs="?", default=WORD_COMPLEXITY_INDEX_PATH,
+                        help="Path to the word complexity index csv")
+    parser.add_argument("binary", nargs="?", default=WORD_COMPLEXITY_INDEX_BINARY_PATH,
+                        help="Path of the binary file to write")
+    args = parser.parse_args()
+    print(f"Wrote {write_binary_index(args.csv, args.binary)} words to {args.binary}")